@@ -0,0 +1,225 @@
+"""
+Exact-match cache of final answers.
+
+Many turns ask the same question and get the same tool data, differing
+only in which patient asked ("is Advil in stock?" for any patient without
+an NSAID allergy). Once a turn's tools have run, its answer is keyed by:
+
+- the normalized user message and the response language
+- whether it is the first question of the conversation (the prompt
+  answers first questions and follow-ups differently)
+- the prompt version
+- a fingerprint of the turn's tool calls and results, with the patient ID
+  and patient names left out
+
+Patient names in a stored answer are replaced by placeholders and filled
+in with the asking patient's names (from the patient record) on replay. An answer that mentions a
+name in a form that can't be templated (e.g. with a Hebrew prefix) is not
+cached, so one patient's name is never shown to another. Entries are
+dropped when the catalog version changes.
+"""
+
+import re
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from app.indexes import contains_hebrew
+from app.records import Patient
+from app.repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+# (tool name, arguments, result) for each tool call of a turn
+ToolResult = Tuple[str, Dict[str, Any], Any]
+
+PATIENT_FIELDS = ("user_name", "user_name_hebrew")
+# Left out of fingerprints (get_patient_details' "name" is handled separately)
+_PATIENT_RESULT_FIELDS = frozenset(PATIENT_FIELDS)
+_PATIENT_ARGS = ("user_id",)
+_PLACEHOLDER = "\x00{}\x00"
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_message(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", text.strip().casefold()))
+
+
+def _strip_patient(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _strip_patient(item) for key, item in value.items() if key not in _PATIENT_RESULT_FIELDS}
+    if isinstance(value, list):
+        return [_strip_patient(item) for item in value]
+    return value
+
+
+def fingerprint(tool_results: Sequence[ToolResult]) -> str:
+    """Fingerprint of a turn's tool calls and results, without patient identity."""
+    entries = set()
+    for tool_name, args, result in tool_results:
+        args = {key: value for key, value in args.items() if key not in _PATIENT_ARGS}
+        result = _strip_patient(result)
+        if tool_name == "get_patient_details" and isinstance(result, dict):
+            result = {key: value for key, value in result.items() if key != "name"}
+        entries.add(json.dumps([tool_name, args, result], sort_keys=True, ensure_ascii=False))
+    return hashlib.sha256("\n".join(sorted(entries)).encode("utf-8")).hexdigest()
+
+
+def patient_names(patient: Optional[Patient]) -> Dict[str, str]:
+    """Names to template out of (and back into) answers for a patient."""
+    if patient is None:
+        return {}
+    return {"user_name": patient.name, "user_name_hebrew": patient.name_hebrew}
+
+
+def answer_key(user_text: str, first_question: bool, prompt_version: str, tools_digest: str) -> str:
+    """Cache key for a turn's answer."""
+    language = "he" if contains_hebrew(user_text) else "en"
+    parts = [normalize_message(user_text), language, "first" if first_question else "follow-up",
+             prompt_version, tools_digest]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def turn_key(messages: Sequence[Dict[str, Any]],
+             tool_results: Sequence[ToolResult],
+             prompt_version: str,
+             session_id: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    Cache key and patient names for the current turn.
+
+    Returns:
+        (key, names), or None if the turn can't use the cache: no tool
+        results yet, or more than one patient in the conversation (the
+        answer could mention any of them)
+    """
+    users = [m for m in messages if m.get("role") == "user"]
+    if not tool_results or not users:
+        return None
+    repository = get_repository()
+    patient_ids = {session_id} if repository.patient_exists(session_id) else set()
+    for message in messages:
+        for call in message.get("tool_calls") or ():
+            try:
+                user_id = json.loads(call["function"]["arguments"] or "{}").get("user_id")
+            except (ValueError, AttributeError):
+                return None
+            if isinstance(user_id, str) and user_id.strip():
+                patient_ids.add(user_id.strip())
+    if len(patient_ids) > 1:
+        return None
+    patient = repository.get_patient(patient_ids.pop()) if patient_ids else None
+    key = answer_key(users[-1].get("content") or "", len(users) == 1, prompt_version, fingerprint(tool_results))
+    return key, patient_names(patient)
+
+
+def _template(content: str, names: Dict[str, str]) -> Optional[str]:
+    """Replace patient names with placeholders, or None if a name can't be templated."""
+    # Longest first, so a full name is replaced before a name it contains
+    for field, name in sorted(names.items(), key=lambda item: -len(item[1])):
+        if name:
+            content = re.sub(rf"(?<!\w){re.escape(name)}(?!\w)", _PLACEHOLDER.format(field), content)
+    # Any leftover part of a name (a first name alone, a prefixed Hebrew form) blocks caching
+    if any(part in content for name in names.values() for part in name.split()):
+        return None
+    return content
+
+
+def _render(template: str, names: Dict[str, str]) -> Optional[str]:
+    for field in PATIENT_FIELDS:
+        placeholder = _PLACEHOLDER.format(field)
+        if placeholder in template:
+            if not names.get(field):
+                return None
+            template = template.replace(placeholder, names[field])
+    return template
+
+
+class _Entry(NamedTuple):
+    catalog_version: Any
+    template: str
+    nbytes: int
+
+
+class AnswerCache:
+    """
+    LRU cache of answer templates with an entry limit and a byte budget.
+    Used from the event loop only, so no locking is needed.
+
+    Args:
+        max_entries: Maximum cached answers
+        max_bytes: Maximum total UTF-8 size of cached answers
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def get(self, key: str, catalog_version: Any, names: Dict[str, str]) -> Optional[str]:
+        """Return the answer for the key with the patient's names filled in, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.catalog_version != catalog_version:
+            self._remove(key)
+            self.stale += 1
+            self.misses += 1
+            return None
+        content = _render(entry.template, names)
+        if content is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return content
+
+    def put(self, key: str, catalog_version: Any, content: str, names: Dict[str, str]) -> bool:
+        """Store an answer; returns False if it can't be cached safely or doesn't fit."""
+        template = _template(content, names) if content else None
+        nbytes = len(template.encode("utf-8")) if template is not None else 0
+        if template is None or nbytes > self.max_bytes or self.max_entries <= 0:
+            self.uncacheable += 1
+            return False
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(catalog_version, template, nbytes)
+        self._bytes += nbytes
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key).nbytes
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "uncacheable": self.uncacheable,
+        }
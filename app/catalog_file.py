@@ -0,0 +1,319 @@
+"""
+Compact binary medication catalog opened with mmap.
+
+Every uvicorn worker that opens the same file shares its pages through the
+OS page cache, and opening it is O(1): no parsing or index building at
+startup. Records are decoded lazily from the columns into Medication
+records, whose to_dict() has the same shape as MEDICATIONS_DB entries.
+
+File layout (little-endian, sections 8-byte aligned):
+- header: magic, version, counts, section offsets
+- string table: interned UTF-8 strings (offsets array + blob)
+- fixed-width columns, one array per field: string IDs for text fields,
+  u32 canonical class ID, u8 requires_rx, i32 stock_level, u32 start/count
+  ranges into the ID pool for ingredients and conflict IDs
+- ID pool: u32 string IDs referenced by the ranges above
+- sorted (string ID, record) tables for names/SKUs, catalog keys,
+  ingredients and drug classes, searched by binary search on UTF-8 bytes
+
+Build a file with: python -m app.catalog_file build catalog.bin
+"""
+
+import mmap
+import struct
+import sys
+import logging
+from array import array
+from collections.abc import Mapping
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Mapping as MappingType, Optional, Set, Tuple
+
+from app.indexes import MedicationIndex, MedicationTraits, normalize_name, parse_ingredients
+from app.records import Medication, make_medication
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PHCATLG\x00"
+VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+# Text fields stored as string IDs, in dict order
+STRING_COLUMNS = ("sku", "name", "name_hebrew", "drug_class", "active_ingredients", "restrictions")
+PAIR_TABLES = ("names", "keys", "ingredients", "classes")
+
+_SECTIONS = (
+    ("string_offsets", "I"),
+    ("string_blob", "B"),
+    ("key", "I"),
+    *((column, "I") for column in STRING_COLUMNS),
+    ("class_id", "I"),
+    ("requires_rx", "B"),
+    ("stock_level", "i"),
+    ("ingredient_start", "I"),
+    ("ingredient_count", "I"),
+    ("conflict_start", "I"),
+    ("conflict_count", "I"),
+    ("pool", "I"),
+    *((table, "I") for table in PAIR_TABLES),
+)
+
+_HEADER = struct.Struct("<8sIIII" + "I" * len(PAIR_TABLES) + "Q" * len(_SECTIONS))
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _StringTable:
+    """Interns strings so each distinct value is stored once."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.values)
+            self.ids[value] = string_id
+            self.values.append(value)
+        return string_id
+
+
+def write_catalog(path: str, medications: MappingType[str, Medication]) -> None:
+    """
+    Write a medication catalog to a binary file.
+
+    Args:
+        path: Output file path
+        medications: Catalog key -> Medication record
+    """
+    index = MedicationIndex(medications)
+    strings = _StringTable()
+    columns: Dict[str, array] = {name: array(code) for name, code in _SECTIONS}
+    pool = columns["pool"]
+    pairs: Dict[str, List[Tuple[bytes, int, int]]] = {table: [] for table in PAIR_TABLES}
+
+    def add_pair(table: str, key: str, record: int) -> None:
+        string_id = strings.intern(key)
+        pairs[table].append((key.encode("utf-8"), string_id, record))
+
+    for record, (med_key, med) in enumerate(medications.items()):
+        columns["key"].append(strings.intern(med_key))
+        for column in STRING_COLUMNS:
+            columns[column].append(strings.intern(getattr(med, column)))
+        columns["requires_rx"].append(int(med.requires_rx))
+        columns["stock_level"].append(med.stock_level)
+
+        traits = index.traits(med_key)
+        columns["class_id"].append(strings.intern(traits.drug_class) if traits.drug_class else NO_STRING)
+        for prefix, ids in (("ingredient", traits.ingredients), ("conflict", traits.conflict_ids)):
+            columns[f"{prefix}_start"].append(len(pool))
+            columns[f"{prefix}_count"].append(len(ids))
+            pool.extend(strings.intern(i) for i in sorted(ids))
+
+        add_pair("keys", med_key, record)
+        for ingredient in traits.ingredients:
+            add_pair("ingredients", ingredient, record)
+        if traits.drug_class:
+            add_pair("classes", traits.drug_class, record)
+
+    positions = {med_key: i for i, med_key in enumerate(medications)}
+    for lookup_key, med_key in index.name_keys():
+        add_pair("names", lookup_key, positions[med_key])
+
+    # Pair tables sorted by UTF-8 bytes, then record for stable posting order
+    for table in PAIR_TABLES:
+        for _, string_id, record in sorted(pairs[table], key=lambda p: (p[0], p[2])):
+            columns[table].extend((string_id, record))
+
+    blob = bytearray()
+    offsets = columns["string_offsets"]
+    for value in strings.values:
+        offsets.append(len(blob))
+        blob.extend(value.encode("utf-8"))
+    offsets.append(len(blob))
+    columns["string_blob"] = array("B", blob)
+
+    section_offsets = []
+    offset = _align(_HEADER.size)
+    for name, _ in _SECTIONS:
+        section_offsets.append(offset)
+        offset = _align(offset + len(columns[name]) * columns[name].itemsize)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(medications), len(strings.values), len(pool),
+                             *(len(pairs[t]) for t in PAIR_TABLES), *section_offsets))
+        for (name, _), section_offset in zip(_SECTIONS, section_offsets):
+            f.write(b"\0" * (section_offset - f.tell()))
+            columns[name].tofile(f)
+
+    logger.info(f"Wrote catalog with {len(medications)} medications and "
+                f"{len(strings.values)} interned strings to {path}")
+
+
+class MappedCatalog(Mapping):
+    """
+    Read-only medication catalog over an mmap'd catalog file.
+
+    Acts as a Mapping of catalog key -> Medication (built lazily from the
+    columns) and exposes the same lookup methods as MedicationIndex, so
+    it can back an InMemoryRepository directly.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, self._count, string_count, pool_count, *rest = \
+            _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} catalog file")
+        pair_counts = dict(zip(PAIR_TABLES, rest[:len(PAIR_TABLES)]))
+        section_offsets = rest[len(PAIR_TABLES):]
+
+        lengths = {
+            "string_offsets": string_count + 1,
+            "pool": pool_count,
+            **{table: pair_counts[table] * 2 for table in PAIR_TABLES},
+        }
+        self._columns: Dict[str, memoryview] = {}
+        for (name, code), offset in zip(_SECTIONS, section_offsets):
+            if name == "string_blob":
+                continue
+            length = lengths.get(name, self._count) * struct.calcsize(code)
+            self._columns[name] = self._view[offset:offset + length].cast(code)
+        blob_offset = section_offsets[[name for name, _ in _SECTIONS].index("string_blob")]
+        self._blob = self._view[blob_offset:blob_offset + self._columns["string_offsets"][-1]]
+
+    def close(self) -> None:
+        """Release the mapping."""
+        for column in self._columns.values():
+            column.release()
+        self._blob.release()
+        self._view.release()
+        self._mmap.close()
+
+    # --- string table and sorted pair tables ---
+
+    def _bytes(self, string_id: int) -> bytes:
+        offsets = self._columns["string_offsets"]
+        return bytes(self._blob[offsets[string_id]:offsets[string_id + 1]])
+
+    def _string(self, string_id: int) -> Optional[str]:
+        if string_id == NO_STRING:
+            return None
+        return self._bytes(string_id).decode("utf-8")
+
+    def _records(self, table: str, key: str) -> List[int]:
+        """Binary search a sorted pair table for every record under key."""
+        pairs = self._columns[table]
+        target = key.encode("utf-8")
+        lo, hi = 0, len(pairs) // 2
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(pairs[2 * mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        records = []
+        while lo < len(pairs) // 2 and self._bytes(pairs[2 * lo]) == target:
+            records.append(pairs[2 * lo + 1])
+            lo += 1
+        return records
+
+    def _record_of(self, med_key: str) -> Optional[int]:
+        records = self._records("keys", med_key)
+        return records[0] if records else None
+
+    def _key_of(self, record: int) -> str:
+        return self._string(self._columns["key"][record])
+
+    def record(self, record: int) -> Medication:
+        """Decode one record from the columns."""
+        string = lambda column: self._string(self._columns[column][record])
+        return make_medication(
+            string("sku"),
+            string("name"),
+            string("name_hebrew"),
+            string("drug_class"),
+            string("active_ingredients"),
+            self._columns["requires_rx"][record],
+            self._columns["stock_level"][record],
+            string("restrictions"),
+        )
+
+    def _pool_ids(self, prefix: str, record: int) -> FrozenSet[str]:
+        start = self._columns[f"{prefix}_start"][record]
+        count = self._columns[f"{prefix}_count"][record]
+        pool = self._columns["pool"]
+        return frozenset(self._string(pool[i]) for i in range(start, start + count))
+
+    # --- Mapping interface ---
+
+    def __getitem__(self, med_key: str) -> Medication:
+        record = self._record_of(med_key)
+        if record is None:
+            raise KeyError(med_key)
+        return self.record(record)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._key_of(record) for record in range(self._count))
+
+    def __len__(self) -> int:
+        return self._count
+
+    # --- MedicationIndex interface ---
+
+    def resolve(self, name: str) -> Optional[str]:
+        records = self._records("names", normalize_name(name))
+        return self._key_of(records[0]) if records else None
+
+    def lookup(self, name: str) -> Tuple[Optional[str], Optional[Medication]]:
+        records = self._records("names", normalize_name(name))
+        if not records:
+            return None, None
+        return self._key_of(records[0]), self.record(records[0])
+
+    def with_ingredients(self, active_ingredients: str) -> Set[str]:
+        postings = [set(self._records("ingredients", i)) for i in parse_ingredients(active_ingredients)]
+        if not postings:
+            return set()
+        postings.sort(key=len)
+        return {self._key_of(r) for r in postings[0].intersection(*postings[1:])}
+
+    def in_drug_classes(self, drug_classes: Iterable[str]) -> Set[str]:
+        keys: Set[str] = set()
+        for drug_class in drug_classes:
+            keys.update(self._key_of(r) for r in self._records("classes", normalize_name(drug_class)))
+        return keys
+
+    def in_catalog_order(self, med_keys: Iterable[str]) -> List[str]:
+        return sorted(med_keys, key=self._record_of)
+
+    def traits(self, med_key: str) -> MedicationTraits:
+        record = self._record_of(med_key)
+        if record is None:
+            raise KeyError(med_key)
+        return MedicationTraits(
+            self._pool_ids("ingredient", record),
+            self._string(self._columns["class_id"][record]) or "",
+            self._pool_ids("conflict", record),
+        )
+
+    def position(self, med_key: str) -> int:
+        return self._record_of(med_key)
+
+
+if __name__ == "__main__":
+    from app.database import MEDICATIONS_DB
+    from app.records import load_medications
+
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        print("Usage: python -m app.catalog_file build <output path>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    write_catalog(sys.argv[2], load_medications(MEDICATIONS_DB))
@@ -0,0 +1,192 @@
+"""
+Deterministic answers for simple questions, without an LLM round trip.
+
+A rule-based router recognizes two kinds of English turn: "do you have
+X?" stock questions and "what are my medications?". It runs
+the same tools the LLM would call and renders the SCENARIO 3 templates
+from the system prompt. The turn is recorded in history as an ordinary
+tool exchange plus assistant reply, so the LLM can take over on a
+follow-up.
+
+Anything that needs judgment falls back to the LLM: unauthenticated
+sessions, unresolved medication names, tool errors and every allergy
+conflict (the SCENARIO 1/2 safety alerts stay with the model).
+
+Messages containing Hebrew are never routed: the prompt's Hebrew
+template translates every field, including dosage instructions and
+safety warnings, and those free-text catalog fields exist only in English.
+"""
+
+import re
+import json
+import time
+import uuid
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.indexes import contains_hebrew
+from app.repository import get_repository
+from app.tool_exec import run_repository_io
+
+logger = logging.getLogger(__name__)
+
+ToolExecutor = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+INTENT_STOCK = "stock"
+INTENT_MY_MEDICATIONS = "my_medications"
+
+_TRAILING = r"(?:\s+(?:please|right now|now|today))?"
+_STOCK_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    rf"^(?:hi,?\s+)?(?:do|does)\s+(?:you|u|the pharmacy)\s+(?:guys\s+)?(?:have|carry|stock)\s+(?:any\s+)?"
+    rf"(?P<med>.+?)(?:\s+in\s+stock|\s+available)?{_TRAILING}$",
+    rf"^(?:is|are)\s+(?:there\s+)?(?:any\s+)?(?P<med>.+?)\s+(?:in\s+stock|available){_TRAILING}$",
+    rf"^(?:any\s+)?(?P<med>.+?)\s+in\s+stock{_TRAILING}$",
+)]
+_MY_MEDICATIONS_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"^(?:what\s+are|what're|show(?:\s+me)?|list|tell\s+me|which\s+are)?\s*my\s+(?:current\s+)?"
+    r"(?:medications|meds|prescriptions|medicines)$",
+    r"^what\s+(?:medications|meds|prescriptions|medicines)\s+(?:do\s+i\s+have|am\s+i\s+(?:on|taking))$",
+)]
+_PUNCTUATION = re.compile(r"[?!.,\s]+$")
+
+DISCLAIMER = ("This information is for reference only. For medical advice, dosage adjustments, "
+              "or concerns, please consult your doctor or pharmacist.")
+
+
+@dataclass
+class Route:
+    """A recognized fast-path intent."""
+    intent: str
+    med_name: Optional[str] = None
+
+
+@dataclass
+class FastAnswer:
+    """Tool calls made and the rendered reply for a fast-path turn."""
+    intent: str
+    tool_calls: List[Tuple[str, str, Dict[str, Any], Dict[str, Any]]] = field(default_factory=list)
+    content: str = ""
+    seconds: float = 0.0
+
+    def to_messages(self) -> List[Dict[str, Any]]:
+        """History messages for the turn, shaped as if the LLM had made the calls."""
+        messages: List[Dict[str, Any]] = []
+        for call_id, name, args, result in self.tool_calls:
+            # One assistant message per call keeps each tool exchange self-contained
+            messages.append({
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [{
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(args)}
+                }]
+            })
+            messages.append({"role": "tool", "tool_call_id": call_id, "content": json.dumps(result)})
+        messages.append({"role": "assistant", "content": self.content})
+        return messages
+
+
+def route(user_input: str) -> Optional[Route]:
+    """Match a user message against the fast-path intents."""
+    text = _PUNCTUATION.sub("", user_input.strip())
+    if contains_hebrew(text):
+        return None
+    for pattern in _MY_MEDICATIONS_PATTERNS:
+        if pattern.match(text):
+            return Route(INTENT_MY_MEDICATIONS)
+    for pattern in _STOCK_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return Route(INTENT_STOCK, match.group("med").strip())
+    return None
+
+
+def _stock_status(stock: int) -> str:
+    return "Currently OUT OF STOCK (0 units available)" if stock <= 0 else f"{stock} units available"
+
+
+def _prescription_status(status: Dict[str, Any]) -> str:
+    if status["has_prescription"]:
+        return "Authorized by prescription"
+    if not status["requires_prescription"]:
+        return "No prescription required (over-the-counter)"
+    return "Prescription required but not on file"
+
+
+def render_details(status: Dict[str, Any]) -> str:
+    """Render one check_user_status result with the prompt's (English) details template."""
+    stock = _stock_status(status["stock_available"])
+    prescription = _prescription_status(status)
+    return (f"**{status['medication']} Details:**\n\n"
+            f"- **Active Ingredients:** {status['active_ingredients']}\n"
+            f"- **Stock Status:** {stock}\n"
+            f"- **Prescription Status:** {prescription}\n"
+            f"- **Dosage & Usage:** {status['patient_usage_instructions']}\n"
+            f"- **Safety Warnings:** {status['medication_restrictions']}\n")
+
+
+def _safe(status: Dict[str, Any]) -> bool:
+    return "error" not in status and not status.get("allergy_conflict")
+
+
+def _call_id() -> str:
+    return f"call_fast_{uuid.uuid4().hex[:16]}"
+
+
+async def try_fast_path(user_input: str, user_id: str, execute: ToolExecutor) -> Optional[FastAnswer]:
+    """
+    Answer a simple question directly if it can be answered from a template.
+
+    Args:
+        user_input: The user's message
+        user_id: Session patient ID (must be a known patient)
+        execute: Coroutine running a tool by name with arguments (execute_tool_call)
+
+    Returns:
+        The answer, or None to hand the turn to the LLM
+    """
+    started = time.perf_counter()
+    matched = route(user_input)
+    if matched is None:
+        return None
+    repository = get_repository()
+    if not await run_repository_io(repository.patient_exists, user_id):
+        return None
+
+    answer = FastAnswer(matched.intent)
+    if matched.intent == INTENT_STOCK:
+        # Only names the catalog resolves exactly; anything else needs the LLM
+        if (await run_repository_io(repository.find_medication, matched.med_name))[1] is None:
+            return None
+        args = {"user_id": user_id, "med_name": matched.med_name}
+        status = await execute("check_user_status", args)
+        if not _safe(status):
+            return None
+        answer.tool_calls.append((_call_id(), "check_user_status", args, status))
+        direct = "Yes, we have it in stock" if status["stock_available"] > 0 else "Currently out of stock"
+        name = status["user_name"]
+        blocks = [render_details(status)]
+
+    else:
+        args = {"user_id": user_id}
+        details = await execute("get_patient_details", args)
+        prescriptions = details.get("current_prescriptions") or []
+        if "error" in details or not prescriptions:
+            return None
+        answer.tool_calls.append((_call_id(), "get_patient_details", args, details))
+        batch_args = {"user_id": user_id, "med_names": prescriptions}
+        batch = await execute("check_user_status_batch", batch_args)
+        statuses = list((batch.get("results") or {}).values())
+        if "error" in batch or len(statuses) != len(prescriptions) or not all(_safe(s) for s in statuses):
+            return None
+        answer.tool_calls.append((_call_id(), "check_user_status_batch", batch_args, batch))
+        direct = "Here are your medications"
+        name = statuses[0]["user_name"]
+        blocks = [render_details(s) for s in statuses]
+
+    answer.content = f"{direct}, {name}.\n\n" + "\n".join(blocks) + f"\n{DISCLAIMER}"
+    answer.seconds = time.perf_counter() - started
+    logger.info(f"Fast path answered {matched.intent} for {user_id} in {answer.seconds * 1000:.1f}ms")
+    return answer
@@ -0,0 +1,158 @@
+"""
+Fuzzy medication name matching for "did you mean" suggestions.
+
+Names are normalized with the same rules as exact lookups (casefold,
+niqqud stripped, Hebrew final letters folded) and indexed by padded
+character trigrams, with postings partitioned by name length. A query
+only scans names whose length is within its typo budget, keeps those
+sharing enough trigrams with it (each edit destroys at most 3), then
+ranks them by edit distance computed with Myers' bit-parallel algorithm.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+from app.indexes import contains_hebrew, normalize_name
+
+DEFAULT_SUGGESTIONS = 3
+
+
+def max_edit_distance(length: int) -> int:
+    """
+    Allowed typo distance for a query of the given length.
+    Kept low enough that the trigram filter still requires shared trigrams.
+    """
+    if length <= 7:
+        return 1
+    if length <= 12:
+        return 2
+    return 3
+
+
+def trigrams(text: str) -> Set[str]:
+    """Padded character trigrams of a normalized name."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Pattern:
+    """Query string precompiled into per-character bitmasks for Myers' algorithm."""
+
+    __slots__ = ("length", "masks", "high_bit", "full")
+
+    def __init__(self, text: str):
+        self.length = len(text)
+        self.masks: Dict[str, int] = {}
+        for i, char in enumerate(text):
+            self.masks[char] = self.masks.get(char, 0) | (1 << i)
+        self.high_bit = 1 << max(self.length - 1, 0)
+        self.full = (1 << self.length) - 1
+
+    def distance(self, text: str) -> int:
+        """Levenshtein distance between the pattern and text."""
+        if not self.length:
+            return len(text)
+        positive, negative, score = self.full, 0, self.length
+        for char in text:
+            eq = self.masks.get(char, 0)
+            xv = eq | negative
+            xh = (((eq & positive) + positive) ^ positive) | eq
+            horizontal_pos = negative | ~(xh | positive)
+            horizontal_neg = positive & xh
+            if horizontal_pos & self.high_bit:
+                score += 1
+            elif horizontal_neg & self.high_bit:
+                score -= 1
+            # Row 0 grows by one per column, so shift a 1 into the positive deltas
+            horizontal_pos = (horizontal_pos << 1) | 1
+            horizontal_neg <<= 1
+            positive = (horizontal_neg | ~(xv | horizontal_pos)) & self.full
+            negative = horizontal_pos & xv & self.full
+        return score
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings."""
+    return _Pattern(a).distance(b)
+
+
+class FuzzyNameIndex:
+    """
+    Trigram index of medication display names for typo-tolerant suggestions.
+    Suggestions come back in the language of the query.
+    """
+
+    def __init__(self, names: Iterable[Tuple[str, str]]):
+        """
+        Args:
+            names: (display name, catalog key) pairs, English and Hebrew mixed
+        """
+        self._names: List[str] = []  # normalized
+        self._entries: List[Tuple[str, str]] = []  # (display name, catalog key)
+        # trigram -> name length -> name ids
+        self._postings: Dict[str, Dict[int, List[int]]] = {}
+
+        seen = set()
+        for display, med_key in names:
+            normalized = normalize_name(display)
+            if not normalized or (normalized, med_key) in seen:
+                continue
+            seen.add((normalized, med_key))
+
+            name_id = len(self._names)
+            self._names.append(normalized)
+            self._entries.append((display, med_key))
+            for gram in trigrams(normalized):
+                by_length = self._postings.setdefault(gram, {})
+                by_length.setdefault(len(normalized), []).append(name_id)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _candidates(self, query: str, max_distance: int) -> List[Tuple[int, int]]:
+        """Return (distance, name id) pairs within max_distance of the query."""
+        query_grams = trigrams(query)
+        # q-gram lemma: each edit can destroy at most 3 shared trigrams
+        min_shared = max(1, len(query_grams) - 3 * max_distance)
+
+        query_length = len(query)
+        lengths = range(max(1, query_length - max_distance), query_length + max_distance + 1)
+        shared = Counter()
+        for gram in query_grams:
+            by_length = self._postings.get(gram)
+            if by_length:
+                for length in lengths:
+                    shared.update(by_length.get(length, ()))
+
+        pattern = _Pattern(query)
+        matches = []
+        for name_id, count in shared.items():
+            if count < min_shared:
+                continue
+            distance = pattern.distance(self._names[name_id])
+            if distance <= max_distance:
+                matches.append((distance, name_id))
+        return matches
+
+    def suggest(self, query: str, limit: int = DEFAULT_SUGGESTIONS) -> List[str]:
+        """
+        Return up to `limit` display names closest to the query, best first.
+        Names are returned in the query's language; each medication appears once.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        matches = self._candidates(normalized, max_edit_distance(len(normalized)))
+
+        hebrew = contains_hebrew(query)
+        suggestions: List[str] = []
+        seen_keys = set()
+        for _, name_id in sorted(matches, key=lambda m: (m[0], self._names[m[1]])):
+            display, med_key = self._entries[name_id]
+            if med_key in seen_keys or contains_hebrew(display) != hebrew:
+                continue
+            seen_keys.add(med_key)
+            suggestions.append(display)
+            if len(suggestions) == limit:
+                break
+        return suggestions
@@ -0,0 +1,213 @@
+"""
+Token-budgeted chat history for LLM requests.
+
+History is grouped into exchanges that must stay whole: a user message,
+a plain assistant reply, or an assistant message with tool_calls plus
+every tool reply answering it. Trimming drops the oldest exchanges
+(never part of one), so the request never carries a tool reply without
+its call or a call without its replies. Tool results older than the most
+recent exchanges can be compacted to the fields the model still needs.
+
+Token counts use tiktoken when it is installed, otherwise a local
+estimate of about four UTF-8 bytes per token.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken missing or its encoding files unavailable offline
+    _ENCODING = None
+
+Message = Dict[str, Any]
+
+# Per-message framing tokens (role, separators) added by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+BYTES_PER_TOKEN = 4
+
+# Fields kept when an older tool result is compacted; other tools keep everything
+COMPACT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "check_user_status": ("medication", "authorized_by_rx", "allergy_conflict", "stock_available"),
+    "get_medication_info": ("name", "requires_rx", "stock_level"),
+}
+# Tools whose result nests one status per medication under "results"
+_BATCH_TOOLS = {"check_user_status_batch": "check_user_status"}
+
+
+def count_tokens(text: str) -> int:
+    """Token count of a string (exact with tiktoken, estimated otherwise)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return -(-len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+
+def message_tokens(message: Message) -> int:
+    """Token count of one chat message, including its tool calls."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+    for call in message.get("tool_calls") or ():
+        function = call.get("function", {})
+        tokens += count_tokens(function.get("name", "")) + count_tokens(function.get("arguments", ""))
+    return tokens
+
+
+def estimate_tokens(messages: Sequence[Message]) -> int:
+    """Token count of a list of chat messages."""
+    return sum(message_tokens(m) for m in messages)
+
+
+def _complete(exchange: List[Message]) -> bool:
+    calls = {c.get("id") for c in exchange[0].get("tool_calls") or ()}
+    return calls == {m.get("tool_call_id") for m in exchange[1:]}
+
+
+def split_exchanges(messages: Sequence[Message]) -> Tuple[List[Message], List[List[Message]]]:
+    """
+    Split history into system messages and exchanges that must stay together.
+    Tool replies with no matching assistant tool_calls are dropped, and so
+    are assistant tool_calls missing any of their replies (a turn that was
+    cancelled or failed while its tools ran).
+    """
+    system: List[Message] = []
+    exchanges: List[List[Message]] = []
+    pending_calls: set = set()
+    for message in messages:
+        role = message.get("role")
+        if role == "system":
+            system.append(message)
+        elif role == "tool":
+            if message.get("tool_call_id") in pending_calls:
+                exchanges[-1].append(message)
+            else:
+                logger.warning(f"Dropping orphaned tool reply {message.get('tool_call_id')}")
+        else:
+            exchanges.append([message])
+            pending_calls = {c.get("id") for c in message.get("tool_calls") or ()}
+    complete = [exchange for exchange in exchanges if _complete(exchange)]
+    if len(complete) != len(exchanges):
+        logger.warning(f"Dropping {len(exchanges) - len(complete)} tool call(s) with missing replies")
+    return system, complete
+
+
+def _compact_result(tool_name: str, result: Any) -> Any:
+    if not isinstance(result, dict) or "error" in result:
+        return result
+    if tool_name in _BATCH_TOOLS and isinstance(result.get("results"), dict):
+        return {"results": {name: _compact_result(_BATCH_TOOLS[tool_name], status)
+                            for name, status in result["results"].items()}}
+    fields = COMPACT_FIELDS.get(tool_name)
+    if not fields:
+        return result
+    return {field: result[field] for field in fields if field in result}
+
+
+def compact_exchange(exchange: List[Message]) -> List[Message]:
+    """Return the exchange with its tool results reduced to COMPACT_FIELDS."""
+    calls = exchange[0].get("tool_calls")
+    if not calls:
+        return exchange
+    names = {c.get("id"): c.get("function", {}).get("name", "") for c in calls}
+    compacted = [exchange[0]]
+    for message in exchange[1:]:
+        tool_name = names.get(message.get("tool_call_id"), "")
+        try:
+            result = json.loads(message.get("content") or "null")
+        except json.JSONDecodeError:
+            compacted.append(message)
+            continue
+        content = json.dumps(_compact_result(tool_name, result), ensure_ascii=False)
+        compacted.append({**message, "content": content} if content != message.get("content") else message)
+    return compacted
+
+
+def _drop_leading_replies(exchanges: List[List[Message]]) -> None:
+    # History should not resume on an assistant reply whose question was dropped
+    while len(exchanges) > 1 and exchanges[0][0].get("role") != "user":
+        exchanges.pop(0)
+
+
+@dataclass
+class TrimResult:
+    """Messages for one request plus what trimming removed."""
+    messages: List[Message]
+    tokens: int
+    original_tokens: int
+    dropped_exchanges: int = 0
+    compacted_exchanges: int = 0
+
+
+def trim_history(messages: Sequence[Message],
+                 max_tokens: int,
+                 keep_recent: int = 2,
+                 compact: bool = True) -> TrimResult:
+    """
+    Fit history into an input-token budget for one LLM request.
+
+    Args:
+        messages: Full session history (not modified)
+        max_tokens: Input-token budget for the request
+        keep_recent: Exchanges before the current turn whose tool results
+            stay uncompacted (the current turn is never compacted)
+        compact: Compact tool results of older exchanges
+
+    Returns:
+        TrimResult with system messages, then the newest exchanges that fit
+
+    Fallback Behavior:
+        - System messages and the current turn (from its user message on)
+          are always kept, even if they alone exceed the budget
+    """
+    system, exchanges = split_exchanges(messages)
+    original_tokens = estimate_tokens(messages)
+    # Without a user message, the newest exchange stands in for the current turn
+    current_turn = max((i for i, e in enumerate(exchanges) if e[0].get("role") == "user"),
+                       default=max(len(exchanges) - 1, 0))
+    compacted = 0
+    if compact:
+        for i in range(max(current_turn - keep_recent, 0)):
+            smaller = compact_exchange(exchanges[i])
+            if any(a is not b for a, b in zip(smaller, exchanges[i])):
+                compacted += 1
+            exchanges[i] = smaller
+
+    kept = exchanges[current_turn:]
+    budget = max_tokens - estimate_tokens(system) - sum(estimate_tokens(e) for e in kept)
+    older: List[List[Message]] = []
+    for exchange in reversed(exchanges[:current_turn]):
+        cost = estimate_tokens(exchange)
+        if cost > budget:
+            break
+        older.append(exchange)
+        budget -= cost
+    older.reverse()
+    kept = older + kept
+
+    _drop_leading_replies(kept)
+    trimmed = system + [m for exchange in kept for m in exchange]
+    return TrimResult(trimmed, estimate_tokens(trimmed), original_tokens,
+                      len(exchanges) - len(kept), compacted)
+
+
+def limit_exchanges(messages: Sequence[Message], max_messages: int) -> Optional[List[Message]]:
+    """
+    Drop the oldest whole exchanges until at most max_messages non-system
+    messages remain, for bounding stored history.
+
+    Returns:
+        The shortened history, or None if it was already within the limit
+    """
+    system, exchanges = split_exchanges(messages)
+    total = sum(len(e) for e in exchanges)
+    if total <= max_messages and len(system) + total == len(messages):
+        return None
+    while len(exchanges) > 1 and total > max_messages:
+        total -= len(exchanges.pop(0))
+    _drop_leading_replies(exchanges)
+    return system + [m for exchange in exchanges for m in exchange]
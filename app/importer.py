@@ -0,0 +1,508 @@
+"""
+Streaming bulk importer for patient, prescription, allergy and medication feeds.
+
+Feeds are CSV (with a header row) or JSONL files, read one row at a time
+through generators, validated, and written to the SQLite backend in
+batches of executemany() calls, one transaction per batch. Memory use is
+bounded by the batch size, not the feed size. Lookup keys and ingredient
+and drug-class terms are indexed as each medication batch is written; the
+allergy conflict IDs (ingredient -> drug class closure) need the whole
+catalog and are rebuilt in SQL at the end.
+
+Columns:
+- patients: id, name, name_hebrew, history (JSONL rows may also carry
+  USERS_DB-style "allergies" and "prescriptions" lists)
+- prescriptions: user_id, name, instructions
+- allergies: user_id, allergy
+- medications: key (defaults to name), sku, name, name_hebrew, drug_class,
+  active_ingredients, requires_rx, stock_level, restrictions
+
+Re-importing a feed is idempotent: patients and medications are upserted,
+and prescriptions and allergies already on file are not duplicated.
+
+Usage:
+    python -m app.importer --db pharmacy.db --medications meds.csv \\
+        --patients patients.jsonl --prescriptions rx.csv --allergies allergies.csv
+
+A running server picks up the new data on POST /admin/reload.
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import time
+import logging
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.catalog_file import write_catalog
+from app.indexes import normalize_name, parse_ingredients
+from app.records import Medication, make_medication
+from app.repository import (
+    DEFAULT_SQLITE_PATH,
+    TERM_CLASS,
+    TERM_CONFLICT,
+    TERM_INGREDIENT,
+    SqliteRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_MAX_ERRORS = 1000
+PROGRESS_EVERY = 500_000
+
+FEEDS = ("medications", "patients", "prescriptions", "allergies")
+
+_TRUE = {"1", "true", "yes", "y", "t"}
+_FALSE = {"0", "false", "no", "n", "f", ""}
+
+_UPSERT_PATIENT = (
+    "INSERT INTO patients VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET name = excluded.name, "
+    "name_hebrew = excluded.name_hebrew, history = excluded.history"
+)
+# Appends after the patient's last entry unless the same one is already on file
+_UPDATE_PRESCRIPTION = "UPDATE prescriptions SET instructions = ?3 WHERE user_id = ?1 AND med_name = ?2"
+_INSERT_PRESCRIPTION = (
+    "INSERT INTO prescriptions "
+    "SELECT ?1, (SELECT COALESCE(MAX(position) + 1, 0) FROM prescriptions WHERE user_id = ?1), ?2, ?3 "
+    "WHERE NOT EXISTS (SELECT 1 FROM prescriptions WHERE user_id = ?1 AND med_name = ?2)"
+)
+_INSERT_ALLERGY = (
+    "INSERT INTO allergies "
+    "SELECT ?1, (SELECT COALESCE(MAX(position) + 1, 0) FROM allergies WHERE user_id = ?1), ?2 "
+    "WHERE NOT EXISTS (SELECT 1 FROM allergies WHERE user_id = ?1 AND allergy = ?2)"
+)
+_UPSERT_MEDICATION = (
+    "INSERT INTO medications VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(med_key) DO UPDATE SET sku = excluded.sku, name = excluded.name, "
+    "name_hebrew = excluded.name_hebrew, drug_class = excluded.drug_class, "
+    "active_ingredients = excluded.active_ingredients, requires_rx = excluded.requires_rx, "
+    "stock_level = excluded.stock_level, restrictions = excluded.restrictions"
+)
+_DELETE_TERMS = "DELETE FROM medication_terms WHERE med_key = ? AND kind != 'conflict'"
+_DELETE_LOOKUPS = "DELETE FROM medication_lookup WHERE med_key = ?"
+_INSERT_LOOKUP = "INSERT OR IGNORE INTO medication_lookup VALUES (?, ?)"
+_INSERT_TERM = "INSERT OR IGNORE INTO medication_terms VALUES (?, ?, ?)"
+
+# Conflict IDs: a medication's ingredients, its class, and every class any
+# of its ingredients belongs to elsewhere in the catalog. The ingredient ->
+# class closure is deduplicated into an indexed temp table first; joining
+# ingredient rows to each other directly grows with the square of the
+# medications sharing an ingredient. CROSS JOIN and INDEXED BY pin the plan
+# so each step is an index lookup even before ANALYZE has run on a new file.
+_REBUILD_CONFLICTS = (
+    f"DELETE FROM medication_terms WHERE kind = '{TERM_CONFLICT}'",
+    f"INSERT OR IGNORE INTO medication_terms "
+    f"SELECT '{TERM_CONFLICT}', term, med_key FROM medication_terms "
+    f"WHERE kind IN ('{TERM_INGREDIENT}', '{TERM_CLASS}')",
+    "CREATE TEMP TABLE IF NOT EXISTS ingredient_classes ("
+    "ingredient TEXT NOT NULL, drug_class TEXT NOT NULL, "
+    "PRIMARY KEY (ingredient, drug_class)) WITHOUT ROWID",
+    "DELETE FROM temp.ingredient_classes",
+    f"INSERT OR IGNORE INTO temp.ingredient_classes "
+    f"SELECT o.term, c.term FROM medication_terms o "
+    f"CROSS JOIN medication_terms c INDEXED BY idx_medication_terms_med "
+    f"ON c.med_key = o.med_key AND c.kind = '{TERM_CLASS}' "
+    f"WHERE o.kind = '{TERM_INGREDIENT}'",
+    f"INSERT OR IGNORE INTO medication_terms "
+    f"SELECT '{TERM_CONFLICT}', ic.drug_class, i.med_key FROM medication_terms i "
+    f"CROSS JOIN temp.ingredient_classes ic ON ic.ingredient = i.term "
+    f"WHERE i.kind = '{TERM_INGREDIENT}'",
+    "DROP TABLE temp.ingredient_classes",
+    "ANALYZE medication_terms",
+)
+
+_ORPHAN_CHECKS = {
+    "prescriptions_for_unknown_patients":
+        "SELECT COUNT(*) FROM prescriptions r WHERE NOT EXISTS "
+        "(SELECT 1 FROM patients p WHERE p.user_id = r.user_id)",
+    "prescriptions_for_unknown_medications":
+        "SELECT COUNT(*) FROM prescriptions r WHERE NOT EXISTS "
+        "(SELECT 1 FROM medications m WHERE m.med_key = r.med_name)",
+    "allergies_for_unknown_patients":
+        "SELECT COUNT(*) FROM allergies a WHERE NOT EXISTS "
+        "(SELECT 1 FROM patients p WHERE p.user_id = a.user_id)",
+}
+
+
+class RowValidationError(ValueError):
+    """Raised for a feed row that can't be imported."""
+
+
+@dataclass
+class FeedReport:
+    """Counters for one imported feed."""
+    feed: str
+    path: str
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "feed": self.feed,
+            "path": self.path,
+            "rows": self.rows,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second),
+            "first_errors": self.errors,
+        }
+
+
+# --- reading ---
+
+def read_rows(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (line number, row) pairs from a CSV or JSONL file.
+
+    Error Handling:
+        - A malformed JSONL line is yielded as a row with a "__error__" key
+          so it is counted as rejected rather than aborting the import
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = {"__error__": f"invalid JSON: {e.msg}"}
+                if not isinstance(row, dict):
+                    row = {"__error__": "expected a JSON object"}
+                yield line_number, row
+    elif path.endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    else:
+        raise ValueError(f"Unsupported feed format (expected .csv or .jsonl): {path}")
+
+
+# --- validation ---
+
+def _text(row: Dict[str, Any], column: str, required: bool = False) -> str:
+    value = row.get(column)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowValidationError(f"missing {column}")
+    return value
+
+
+def _boolean(row: Dict[str, Any], column: str, default: bool) -> bool:
+    value = row.get(column)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return default if text == "" else False
+    raise RowValidationError(f"invalid {column}: {value!r}")
+
+
+def _count(row: Dict[str, Any], column: str) -> int:
+    value = row.get(column)
+    if value is None or value == "":
+        return 0
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise RowValidationError(f"invalid {column}: {value!r}")
+    if count < 0:
+        raise RowValidationError(f"negative {column}: {count}")
+    return count
+
+
+def _list(row: Dict[str, Any], column: str) -> List[Any]:
+    value = row.get(column)
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise RowValidationError(f"invalid {column} (expected a list): {value!r}")
+    return value
+
+
+def _check(row: Dict[str, Any]) -> None:
+    if "__error__" in row:
+        raise RowValidationError(row["__error__"])
+
+
+def validate_patient(row: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    _check(row)
+    user_id = _text(row, "id", required=True)
+    name = _text(row, "name", required=True)
+    return user_id, name, _text(row, "name_hebrew") or name, _text(row, "history")
+
+
+def validate_prescription(row: Dict[str, Any]) -> Tuple[str, str, str]:
+    _check(row)
+    return _text(row, "user_id", required=True), _text(row, "name", required=True), _text(row, "instructions")
+
+
+def validate_allergy(row: Dict[str, Any]) -> Tuple[str, str]:
+    _check(row)
+    return _text(row, "user_id", required=True), _text(row, "allergy", required=True)
+
+
+def validate_medication(row: Dict[str, Any]) -> Tuple[str, Medication]:
+    _check(row)
+    name = _text(row, "name", required=True)
+    med = make_medication(
+        _text(row, "sku"),
+        name,
+        _text(row, "name_hebrew"),
+        _text(row, "drug_class"),
+        _text(row, "active_ingredients", required=True),
+        _boolean(row, "requires_rx", default=True),
+        _count(row, "stock_level"),
+        _text(row, "restrictions"),
+    )
+    return _text(row, "key") or name, med
+
+
+# --- writing ---
+
+def _batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Importer:
+    """Writes validated feed rows into a SQLite repository database."""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_errors: int = DEFAULT_MAX_ERRORS):
+        """
+        Args:
+            path: SQLite database file (created with the repository schema if missing)
+            batch_size: Rows written per transaction
+            max_errors: Rejected rows tolerated per feed before aborting
+                (batches already written stay committed)
+        """
+        SqliteRepository(path).close()
+        self.path = path
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.conn = sqlite3.connect(path, cached_statements=64)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def clear(self) -> None:
+        """Delete all patient and medication data before a full reload."""
+        with self.conn:
+            for table in ("patients", "prescriptions", "allergies", "medications",
+                          "medication_lookup", "medication_terms"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def _validated(self, report: FeedReport, rows: Iterable[Tuple[int, Dict[str, Any]]],
+                   validate: Callable[[Dict[str, Any]], Any]) -> Iterator[Any]:
+        """Yield validated rows, counting and logging rejects."""
+        started = time.perf_counter()
+        for line_number, row in rows:
+            report.rows += 1
+            try:
+                yield validate(row)
+            except RowValidationError as e:
+                report.rejected += 1
+                if len(report.errors) < 10:
+                    report.errors.append(f"line {line_number}: {e}")
+                if report.rejected > self.max_errors:
+                    raise RowValidationError(
+                        f"{report.feed}: more than {self.max_errors} invalid rows, aborting "
+                        f"(first: {report.errors[0]})")
+            if report.rows % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - started
+                logger.info(f"{report.feed}: {report.rows} rows ({report.rows / elapsed:,.0f} rows/sec)")
+
+    def _run(self, feed: str, path: str, validate: Callable[[Dict[str, Any]], Any],
+             write: Callable[[List[Any]], None]) -> FeedReport:
+        report = FeedReport(feed, path)
+        started = time.perf_counter()
+        for batch in _batches(self._validated(report, read_rows(path), validate), self.batch_size):
+            with self.conn:
+                write(batch)
+            report.imported += len(batch)
+        report.seconds = time.perf_counter() - started
+        logger.info(f"Imported {report.imported} {feed} from {path} "
+                    f"({report.rejected} rejected, {report.rows_per_second:,.0f} rows/sec)")
+        return report
+
+    def import_patients(self, path: str) -> FeedReport:
+        def validate(row):
+            patient = validate_patient(row)
+            user_id = patient[0]
+            prescriptions = []
+            for rx in _list(row, "prescriptions"):
+                if not isinstance(rx, dict):
+                    raise RowValidationError(f"invalid prescription (expected an object): {rx!r}")
+                prescriptions.append(validate_prescription({**rx, "user_id": user_id}))
+            allergies = []
+            for allergy in _list(row, "allergies"):
+                if not isinstance(allergy, str):
+                    raise RowValidationError(f"invalid allergy (expected a string): {allergy!r}")
+                allergies.append(validate_allergy({"user_id": user_id, "allergy": allergy}))
+            return patient, prescriptions, allergies
+
+        def write(batch):
+            self.conn.executemany(_UPSERT_PATIENT, [patient for patient, _, _ in batch])
+            self._write_prescriptions([rx for _, rxs, _ in batch for rx in rxs])
+            self.conn.executemany(_INSERT_ALLERGY, [a for _, _, allergies in batch for a in allergies])
+
+        return self._run("patients", path, validate, write)
+
+    def _write_prescriptions(self, prescriptions: List[Tuple[str, str, str]]) -> None:
+        self.conn.executemany(_UPDATE_PRESCRIPTION, prescriptions)
+        self.conn.executemany(_INSERT_PRESCRIPTION, prescriptions)
+
+    def import_prescriptions(self, path: str) -> FeedReport:
+        return self._run("prescriptions", path, validate_prescription, self._write_prescriptions)
+
+    def import_allergies(self, path: str) -> FeedReport:
+        return self._run("allergies", path, validate_allergy,
+                         lambda batch: self.conn.executemany(_INSERT_ALLERGY, batch))
+
+    def import_medications(self, path: str) -> FeedReport:
+        next_position = self.conn.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM medications").fetchone()[0]
+
+        def write(batch):
+            nonlocal next_position
+            rows, lookups, terms = [], [], []
+            for med_key, med in batch:
+                rows.append((med_key, next_position, med.sku, med.name, med.name_hebrew,
+                             med.drug_class, med.active_ingredients, int(med.requires_rx),
+                             med.stock_level, med.restrictions))
+                next_position += 1
+                for raw in (med_key, med.name, med.name_hebrew, med.sku):
+                    if raw:
+                        lookups.append((normalize_name(raw), med_key))
+                terms.extend((TERM_INGREDIENT, i, med_key) for i in parse_ingredients(med.active_ingredients))
+                drug_class = normalize_name(med.drug_class)
+                if drug_class:
+                    terms.append((TERM_CLASS, drug_class, med_key))
+            self.conn.executemany(_UPSERT_MEDICATION, rows)
+            # Old names, Hebrew names and SKUs of re-imported medications must stop resolving
+            self.conn.executemany(_DELETE_LOOKUPS, [(med_key,) for med_key, _ in batch])
+            self.conn.executemany(_DELETE_TERMS, [(med_key,) for med_key, _ in batch])
+            self.conn.executemany(_INSERT_LOOKUP, lookups)
+            self.conn.executemany(_INSERT_TERM, terms)
+
+        report = self._run("medications", path, validate_medication, write)
+        started = time.perf_counter()
+        with self.conn:
+            for statement in _REBUILD_CONFLICTS:
+                self.conn.execute(statement)
+        logger.info(f"Rebuilt allergy conflict IDs in {time.perf_counter() - started:.2f}s")
+        return report
+
+    def orphans(self) -> Dict[str, int]:
+        """Count rows that reference patients or medications not on file."""
+        return {name: self.conn.execute(sql).fetchone()[0] for name, sql in _ORPHAN_CHECKS.items()}
+
+    def medications(self) -> Dict[str, Medication]:
+        """Load every medication record in catalog order."""
+        return {
+            row[0]: make_medication(*row[1:])
+            for row in self.conn.execute(
+                "SELECT med_key, sku, name, name_hebrew, drug_class, active_ingredients, "
+                "requires_rx, stock_level, restrictions FROM medications ORDER BY position")
+        }
+
+
+def run_import(path: str, feeds: Dict[str, Optional[str]], replace: bool = False,
+               batch_size: int = DEFAULT_BATCH_SIZE, max_errors: int = DEFAULT_MAX_ERRORS,
+               catalog_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Import feeds into a SQLite database.
+
+    Args:
+        path: SQLite database file
+        feeds: Feed name ("medications", "patients", "prescriptions",
+            "allergies") -> file path; feeds are imported in that order
+        replace: Delete existing data first
+        batch_size: Rows written per transaction
+        max_errors: Rejected rows tolerated per feed before aborting
+        catalog_path: Also write an mmap catalog file of the medications
+
+    Returns:
+        Report with per-feed counts and rows/sec, plus orphan counts
+    """
+    importer = Importer(path, batch_size, max_errors)
+    started = time.perf_counter()
+    try:
+        if replace:
+            importer.clear()
+        reports = []
+        for feed in FEEDS:
+            if feeds.get(feed):
+                reports.append(getattr(importer, f"import_{feed}")(feeds[feed]).to_dict())
+        if catalog_path:
+            write_catalog(catalog_path, importer.medications())
+        orphans = importer.orphans()
+    finally:
+        importer.close()
+
+    total_rows = sum(r["rows"] for r in reports)
+    seconds = time.perf_counter() - started
+    return {
+        "database": path,
+        "feeds": reports,
+        "total_rows": total_rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(total_rows / seconds) if seconds else 0,
+        "orphans": orphans,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import pharmacy data into SQLite.")
+    parser.add_argument("--db", default=DEFAULT_SQLITE_PATH, help="SQLite database file")
+    for feed in FEEDS:
+        parser.add_argument(f"--{feed}", help=f"{feed} feed (.csv or .jsonl)")
+    parser.add_argument("--replace", action="store_true", help="delete existing data first")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--max-errors", type=int, default=DEFAULT_MAX_ERRORS)
+    parser.add_argument("--catalog", help="also write an mmap catalog file of the medications")
+    args = parser.parse_args(argv)
+
+    feeds = {feed: getattr(args, feed) for feed in FEEDS}
+    if not any(feeds.values()):
+        parser.error("no feeds given")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        report = run_import(args.db, feeds, args.replace, args.batch_size, args.max_errors, args.catalog)
+    except (OSError, ValueError) as e:
+        logger.error(f"Import failed: {e}")
+        return 1
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
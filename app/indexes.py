@@ -0,0 +1,282 @@
+"""
+Lookup indexes over the medication catalog and compiled patient allergy sets.
+Built once per catalog so tools resolve medications, alternatives and
+allergy conflicts without scanning the catalog on every call.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import (Dict, FrozenSet, Iterable, Iterator, List, Mapping,
+                    NamedTuple, Optional, Set, Tuple)
+
+from app.records import Medication
+
+# Hebrew points and cantillation marks (niqqud, dagesh, shin/sin dots, te'amim).
+# Punctuation in the same block (maqaf, paseq, sof pasuq) is kept.
+_HEBREW_MARKS_RE = re.compile(r"[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")
+_HEBREW_LETTER_RE = re.compile(r"[\u05D0-\u05EA]")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Separators between components of a combination product ("Paracetamol, Caffeine")
+_INGREDIENT_SPLIT_RE = re.compile(r"\s*(?:[,;+/&]|\band\b|\bwith\b)\s*")
+
+# Salt and hydrate forms that follow the base ingredient name. They are dropped
+# so "Amoxicillin Trihydrate" and "Metformin Hydrochloride" index under
+# "amoxicillin" and "metformin".
+_SALT_FORMS = frozenset({
+    "acetate", "anhydrous", "besylate", "bitartrate", "citrate", "dihydrate",
+    "fumarate", "hcl", "hydrate", "hydrobromide", "hydrochloride", "maleate",
+    "mesylate", "monohydrate", "phosphate", "potassium", "sodium", "succinate",
+    "sulfate", "sulphate", "tartrate", "trihydrate",
+})
+
+# Final letter forms fold to their regular forms (ך->כ, ם->מ, ן->נ, ף->פ, ץ->צ),
+# Hebrew geresh/gershayim fold to ASCII quotes.
+_HEBREW_FOLD = str.maketrans({
+    "ך": "כ",
+    "ם": "מ",
+    "ן": "נ",
+    "ף": "פ",
+    "ץ": "צ",
+    "׳": "'",
+    "״": '"',
+})
+
+
+def contains_hebrew(text: str) -> bool:
+    """Return True if the text contains at least one Hebrew letter."""
+    return bool(text) and _HEBREW_LETTER_RE.search(text) is not None
+
+
+def normalize_name(text: str) -> str:
+    """
+    Normalize a medication name or SKU into a lookup key.
+
+    English is casefolded. Hebrew is NFC-normalized, stripped of niqqud and
+    cantillation marks, and final-letter forms are folded. Whitespace is
+    collapsed so "  Advil " and "advil" produce the same key.
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = _HEBREW_MARKS_RE.sub("", text)
+    text = text.translate(_HEBREW_FOLD).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def parse_ingredients(text: str) -> FrozenSet[str]:
+    """
+    Tokenize an active-ingredients string into canonical ingredient IDs.
+
+    Combination products are split into components, each component is
+    normalized and trailing salt/hydrate forms are dropped.
+    Example: "Amoxicillin Trihydrate" -> {"amoxicillin"}
+    """
+    ingredients = set()
+    for component in _INGREDIENT_SPLIT_RE.split(normalize_name(text)):
+        words = component.split()
+        if not words:
+            continue
+        base = [words[0]] + [w for w in words[1:] if w not in _SALT_FORMS]
+        ingredients.add(" ".join(base))
+    return frozenset(ingredients)
+
+
+class MedicationTraits(NamedTuple):
+    """Canonical IDs of a medication used for alternatives and allergy checks."""
+    ingredients: FrozenSet[str]
+    drug_class: str
+    conflict_ids: FrozenSet[str]
+
+
+class MedicationIndex:
+    """
+    Lookup indexes over a medication catalog:
+    - names: English names, Hebrew names and SKUs -> catalog key
+    - ingredients: canonical ingredient ID -> set of catalog keys
+    - drug classes: normalized drug class -> set of catalog keys
+    - conflict IDs: catalog key -> ingredient and drug-class IDs an allergy
+      can match, including every class its ingredients belong to anywhere
+      in the catalog (ingredient -> class closure)
+    """
+
+    def __init__(self, medications: Mapping[str, Medication]):
+        self._medications = medications
+        self._by_key: Dict[str, str] = {}
+        self._by_ingredient: Dict[str, Set[str]] = {}
+        self._by_class: Dict[str, Set[str]] = {}
+        self._position: Dict[str, int] = {}
+        self._ingredient_classes: Dict[str, Set[str]] = {}
+        self._traits: Dict[str, MedicationTraits] = {}
+        parsed: Dict[str, Tuple[FrozenSet[str], str]] = {}
+
+        for position, (med_key, med) in enumerate(medications.items()):
+            self._position[med_key] = position
+
+            for raw in (med_key, med.name, med.name_hebrew, med.sku):
+                if raw:
+                    # First record wins if two medications ever share a key
+                    self._by_key.setdefault(normalize_name(raw), med_key)
+
+            ingredients = parse_ingredients(med.active_ingredients)
+            drug_class = normalize_name(med.drug_class)
+            parsed[med_key] = (ingredients, drug_class)
+
+            for ingredient in ingredients:
+                self._by_ingredient.setdefault(ingredient, set()).add(med_key)
+                if drug_class:
+                    self._ingredient_classes.setdefault(ingredient, set()).add(drug_class)
+
+            if drug_class:
+                self._by_class.setdefault(drug_class, set()).add(med_key)
+
+        # Second pass once the closure table is complete
+        for med_key, (ingredients, drug_class) in parsed.items():
+            ids = set(ingredients)
+            if drug_class:
+                ids.add(drug_class)
+            for ingredient in ingredients:
+                ids |= self._ingredient_classes.get(ingredient, set())
+            self._traits[med_key] = MedicationTraits(ingredients, drug_class, frozenset(ids))
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Return the catalog key for a name or SKU, or None if unknown."""
+        return self._by_key.get(normalize_name(name))
+
+    def lookup(self, name: str) -> Tuple[Optional[str], Optional[Medication]]:
+        """Return (catalog key, medication record), or (None, None) if unknown."""
+        med_key = self.resolve(name)
+        if med_key is None:
+            return None, None
+        return med_key, self._medications[med_key]
+
+    def with_ingredients(self, active_ingredients: str) -> Set[str]:
+        """
+        Return catalog keys of medications containing every ingredient in
+        the query. Cost scales with the size of the posting lists, not the
+        catalog.
+        """
+        postings = [self._by_ingredient.get(i, set())
+                    for i in parse_ingredients(active_ingredients)]
+        if not postings:
+            return set()
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def in_drug_classes(self, drug_classes: Iterable[str]) -> Set[str]:
+        """Return catalog keys of medications in any of the given drug classes."""
+        keys: Set[str] = set()
+        for drug_class in drug_classes:
+            keys |= self._by_class.get(normalize_name(drug_class), set())
+        return keys
+
+    def in_catalog_order(self, med_keys: Iterable[str]) -> List[str]:
+        """Sort catalog keys by their position in the source catalog."""
+        return sorted(med_keys, key=self._position.__getitem__)
+
+    def traits(self, med_key: str) -> MedicationTraits:
+        """Return the canonical ingredient, class and conflict IDs of a medication."""
+        return self._traits[med_key]
+
+    def name_keys(self) -> Iterator[Tuple[str, str]]:
+        """Yield (normalized lookup key, catalog key) pairs."""
+        return iter(self._by_key.items())
+
+    def position(self, med_key: str) -> int:
+        """Return the position of a medication in the source catalog."""
+        return self._position[med_key]
+
+
+class AllergyProfile:
+    """
+    A patient's allergies compiled into canonical ingredient/class IDs,
+    plus each allergy's normalized text for partial matches.
+    """
+
+    __slots__ = ("source", "allergies", "ids", "terms")
+
+    def __init__(self, allergies: Iterable[str]):
+        self.source: Tuple[str, ...] = tuple(allergies)
+        self.allergies: List[Tuple[str, FrozenSet[str]]] = []
+        self.terms: List[Tuple[str, str]] = []
+        ids: Set[str] = set()
+        for allergy in self.source:
+            term = normalize_name(allergy)
+            allergy_ids = parse_ingredients(allergy) | {term}
+            self.allergies.append((allergy, frozenset(allergy_ids)))
+            ids |= allergy_ids
+            if term:
+                self.terms.append((allergy, term))
+        self.ids: FrozenSet[str] = frozenset(ids)
+
+
+class AllergyProfileCache:
+    """
+    Per-patient cache of compiled allergy profiles.
+    A profile is recompiled only when that patient's allergy list changes.
+    Bounded with LRU eviction so large patient bases don't grow it unchecked.
+    """
+
+    def __init__(self, max_size: int = 10_000):
+        self._max_size = max_size
+        self._profiles: "OrderedDict[str, AllergyProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, allergies: Iterable[str]) -> AllergyProfile:
+        """Return the compiled profile for a patient, recompiling if stale."""
+        allergies = tuple(allergies)
+        with self._lock:
+            profile = self._profiles.get(user_id)
+            if profile is not None and profile.source == allergies:
+                self._profiles.move_to_end(user_id)
+                return profile
+
+        profile = AllergyProfile(allergies)
+        with self._lock:
+            self._profiles[user_id] = profile
+            self._profiles.move_to_end(user_id)
+            if len(self._profiles) > self._max_size:
+                self._profiles.popitem(last=False)
+        return profile
+
+
+def find_allergy_conflict(
+        profile: AllergyProfile,
+        traits: MedicationTraits,
+        drug_class_label: str,
+        active_ingredients: str = ""
+) -> Optional[str]:
+    """
+    Check a compiled allergy profile against a medication.
+
+    Args:
+        profile: The patient's compiled allergies
+        traits: The medication's canonical IDs
+        drug_class_label: Drug class as shown to the patient (e.g. "Penicillin")
+        active_ingredients: The medication's active-ingredients text, for
+            partial matches
+
+    Returns:
+        Conflict description, or None if the patient can take it.
+        Canonical IDs are matched first with set intersections; an allergy
+        that appears anywhere in the ingredients text ("Sulfa" in
+        "Sulfamethoxazole", "valproate" in "Sodium Valproate") is also a
+        conflict, as it was before allergies were compiled.
+    """
+    if not profile.ids.isdisjoint(traits.conflict_ids):
+        for allergy, allergy_ids in profile.allergies:
+            matched = allergy_ids & traits.conflict_ids
+            if not matched:
+                continue
+            if traits.drug_class in matched:
+                return f"Patient is allergic to {drug_class_label}."
+            if matched & traits.ingredients:
+                return f"Patient is allergic to active ingredient {allergy.lower()}."
+            # Matched through the ingredient -> class closure
+            return f"Patient is allergic to {allergy}."
+
+    if profile.terms and active_ingredients:
+        ingredients_text = normalize_name(active_ingredients)
+        for allergy, term in profile.terms:
+            if term in ingredients_text:
+                return f"Patient is allergic to active ingredient {allergy.lower()}."
+    return None
@@ -0,0 +1,169 @@
+"""
+Concurrent-safe stock counters.
+
+Catalog records are immutable (frozen dataclasses, or columns in a
+read-only mmap), so live stock lives in an InventoryStore that overlays
+the catalog's stock_level. Counters are spread over lock-striped shards:
+writers lock only the shard that holds the key, single-key reads take no
+lock, and multi-key reads lock just the shards involved so a batch sees
+one consistent state.
+
+This overlay is per process, so it serves the memory backend. The SQLite
+backend keeps live stock in the medications table instead (SqliteInventory
+in app/repository.py), so every worker reads and updates the same rows.
+"""
+
+import itertools
+import threading
+import logging
+from typing import Container, Dict, Iterable, List, Mapping, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRIPES = 64
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a decrement would take stock below zero."""
+
+
+class _Stripe:
+    __slots__ = ("lock", "levels")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.levels: Dict[str, int] = {}
+
+
+class InventoryStore:
+    """
+    Lock-striped stock levels keyed by catalog key.
+
+    Keys that were never written fall back to the catalog's stock_level,
+    passed in by the caller as the default.
+    """
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        """
+        Args:
+            stripes: Number of independently locked shards
+        """
+        self._stripes: List[_Stripe] = [_Stripe() for _ in range(stripes)]
+        self._versions = itertools.count(1)
+        self._version = 0
+        self._version_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Monotonic counter bumped on every stock change."""
+        return self._version
+
+    def _index(self, med_key: str) -> int:
+        return hash(med_key) % len(self._stripes)
+
+    def _stripe(self, med_key: str) -> _Stripe:
+        return self._stripes[self._index(med_key)]
+
+    def _changed(self) -> None:
+        # Writers on different shards race here; drawing and storing under one
+        # lock keeps the stored version from ever moving backwards
+        with self._version_lock:
+            self._version = next(self._versions)
+
+    def level(self, med_key: str, default: int) -> int:
+        """Return the current stock level (lock-free single-key read)."""
+        return self._stripe(med_key).levels.get(med_key, default)
+
+    def levels(self, defaults: Mapping[str, int]) -> Dict[str, int]:
+        """
+        Return stock levels for several keys as one consistent snapshot.
+
+        Args:
+            defaults: Catalog key -> catalog stock_level for keys never written
+        """
+        # Fixed lock order (by shard index) so concurrent batches can't deadlock
+        stripes = [self._stripes[i] for i in sorted({self._index(key) for key in defaults})]
+        for stripe in stripes:
+            stripe.lock.acquire()
+        try:
+            return {key: self._stripe(key).levels.get(key, default)
+                    for key, default in defaults.items()}
+        finally:
+            for stripe in reversed(stripes):
+                stripe.lock.release()
+
+    def decrement(self, med_key: str, quantity: int, default: int) -> int:
+        """
+        Atomically remove units from stock.
+
+        Returns:
+            The new stock level
+
+        Error Handling:
+            - Raises InsufficientStockError if stock would go below zero
+            - Raises ValueError for a non-positive quantity
+        """
+        if quantity <= 0:
+            raise ValueError(f"Quantity must be positive, got {quantity}")
+        stripe = self._stripe(med_key)
+        with stripe.lock:
+            current = stripe.levels.get(med_key, default)
+            if current < quantity:
+                raise InsufficientStockError(
+                    f"Only {current} units of {med_key} in stock, requested {quantity}")
+            stripe.levels[med_key] = current - quantity
+            self._changed()
+            return current - quantity
+
+    def restock(self, med_key: str, quantity: int, default: int) -> int:
+        """Atomically add units to stock and return the new level."""
+        if quantity <= 0:
+            raise ValueError(f"Quantity must be positive, got {quantity}")
+        stripe = self._stripe(med_key)
+        with stripe.lock:
+            new_level = stripe.levels.get(med_key, default) + quantity
+            stripe.levels[med_key] = new_level
+            self._changed()
+            return new_level
+
+    def apply_feed(self, feed: Iterable[Tuple[str, int]]) -> int:
+        """
+        Ingest absolute stock levels from a stock feed.
+
+        Updates are grouped by shard so each shard is locked once per feed,
+        and each shard's updates become visible together.
+
+        Returns:
+            Number of stock levels applied
+        """
+        by_stripe: Dict[int, Dict[str, int]] = {}
+        for med_key, level in feed:
+            if level < 0:
+                raise ValueError(f"Negative stock level for {med_key}: {level}")
+            by_stripe.setdefault(self._index(med_key), {})[med_key] = int(level)
+
+        applied = 0
+        for stripe_index, updates in sorted(by_stripe.items()):
+            stripe = self._stripes[stripe_index]
+            with stripe.lock:
+                stripe.levels.update(updates)
+                self._changed()
+            applied += len(updates)
+
+        logger.info(f"Applied stock feed with {applied} levels")
+        return applied
+
+    def retain(self, med_keys: Container[str]) -> int:
+        """
+        Drop levels of keys no longer in the catalog.
+
+        Returns:
+            Number of stock levels kept
+        """
+        kept = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                for med_key in [key for key in stripe.levels if key not in med_keys]:
+                    del stripe.levels[med_key]
+                kept += len(stripe.levels)
+        return kept
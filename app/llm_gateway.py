@@ -0,0 +1,310 @@
+"""
+Gateway for upstream LLM requests.
+
+Every completion request goes through one LLMGateway, which:
+- caps concurrent requests globally and per model, with a bounded wait
+  queue (requests beyond it, or waiting too long, are rejected at once)
+- reuses HTTP connections from a keep-alive pool with explicit timeouts
+- retries retryable failures (429, 5xx, timeouts, connection errors)
+  with jittered exponential backoff, honoring Retry-After
+- opens a circuit breaker after repeated upstream failures, failing fast
+  until a trial request succeeds
+
+Only opening the stream is retried; once tokens have been sent to the
+client, a failure ends the turn. Settings come from environment
+variables (see GatewayConfig.from_env); OPENAI_BASE_URL points the client
+at another endpoint, such as the mock server in benchmarks/mock_llm.py.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class GatewayError(Exception):
+    """An LLM request that could not be served; the message is shown to the user."""
+
+
+class GatewayBusy(GatewayError):
+    """The wait queue is full or the wait for a request slot timed out."""
+
+
+class CircuitOpen(GatewayError):
+    """The upstream is failing and requests are rejected until it recovers."""
+
+
+class UpstreamError(GatewayError):
+    """The upstream request failed (after retries, if retryable)."""
+
+
+@dataclass
+class GatewayConfig:
+    """Gateway limits, pool and retry settings."""
+    max_concurrency: int = 32
+    model_concurrency: Dict[str, int] = field(default_factory=dict)
+    max_queue: int = 64
+    queue_timeout: float = 10.0
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    breaker_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    max_connections: int = 64
+    max_keepalive_connections: int = 32
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    base_url: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "GatewayConfig":
+        """
+        Read settings from LLM_* environment variables.
+        LLM_MODEL_CONCURRENCY takes "model=limit,model=limit".
+        """
+        models = {}
+        for entry in filter(None, (part.strip() for part in os.getenv("LLM_MODEL_CONCURRENCY", "").split(","))):
+            model, _, limit = entry.partition("=")
+            models[model.strip()] = int(limit)
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+            model_concurrency=models,
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "10")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            breaker_reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "64")),
+            read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "60")),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+        )
+
+
+def create_client(api_key: str, config: GatewayConfig) -> AsyncOpenAI:
+    """AsyncOpenAI client on a tuned keep-alive pool, with its own retries off."""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+    )
+    return AsyncOpenAI(api_key=api_key, base_url=config.base_url, http_client=http_client, max_retries=0)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for rate limits, server errors, timeouts and connection failures."""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """
+    Closed: requests pass. After `threshold` consecutive failures it opens
+    and rejects requests for `reset_seconds`, then lets one trial request
+    through (half-open); the trial's outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial_running = False
+
+    def allow(self) -> Tuple[bool, bool]:
+        """
+        Decide whether a request may be sent now.
+
+        Returns:
+            (allowed, trial): trial is True for the one half-open trial
+            request, which must call release() if it ends without a
+            recorded success or failure
+        """
+        if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_running:
+                return False, False
+            self._trial_running = True
+            return True, True
+        return self.state != self.OPEN, False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning(f"LLM circuit breaker opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+
+    def release(self) -> None:
+        """End a trial that neither succeeded nor failed upstream (e.g. client went away)."""
+        self._trial_running = False
+
+
+class _Limiter:
+    """Semaphore with a bounded number of waiters."""
+
+    def __init__(self, limit: int, max_queue: int):
+        self._semaphore = asyncio.Semaphore(limit)
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self, timeout: float) -> None:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise GatewayBusy("The assistant is handling too many requests right now. Please try again shortly.")
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(timeout):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            self.rejected += 1
+            raise GatewayBusy("The assistant is busy. Please try again in a moment.") from None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting, "rejected": self.rejected}
+
+
+class LLMGateway:
+    """Concurrency-limited, retrying, circuit-broken access to chat completions."""
+
+    def __init__(self, client: AsyncOpenAI, config: Optional[GatewayConfig] = None):
+        self.client = client
+        self.config = config or GatewayConfig()
+        self.breaker = CircuitBreaker(self.config.breaker_threshold, self.config.breaker_reset_seconds)
+        self._global = _Limiter(self.config.max_concurrency, self.config.max_queue)
+        self._models: Dict[str, _Limiter] = {}
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _model_limiter(self, model: str) -> _Limiter:
+        limiter = self._models.get(model)
+        if limiter is None:
+            limit = self.config.model_concurrency.get(model, self.config.max_concurrency)
+            limiter = self._models[model] = _Limiter(limit, self.config.max_queue)
+        return limiter
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        # Full jitter: uniform over [0, base * 2^attempt], capped, unless the server says when
+        delay = _retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.config.backoff_max, self.config.backoff_base * 2 ** attempt))
+        return min(delay, self.config.backoff_max)
+
+    async def _create(self, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except openai.APIError as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                if not retryable or attempt >= self.config.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+                    self.failures += 1
+                    logger.error(f"LLM request failed after {attempt + 1} attempt(s): {e}")
+                    raise UpstreamError("The assistant is temporarily unavailable. Please try again.") from e
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"LLM request failed ({e}); retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def stream(self, model: str, **kwargs) -> AsyncIterator[Any]:
+        """
+        Open a streamed chat completion, holding a request slot until the block exits.
+
+        Raises:
+            CircuitOpen: The upstream is marked unhealthy
+            GatewayBusy: No slot became free in time or the queue is full
+            UpstreamError: The request failed
+        """
+        allowed, trial = self.breaker.allow()
+        if not allowed:
+            raise CircuitOpen("The assistant is temporarily unavailable. Please try again in a minute.")
+        self.requests += 1
+        model_limiter = self._model_limiter(model)
+        acquired = []
+        try:
+            for limiter in (self._global, model_limiter):
+                await limiter.acquire(self.config.queue_timeout)
+                acquired.append(limiter)
+            yield await self._create(model=model, stream=True, **kwargs)
+            # Healthy only once the whole stream has been read
+            self.breaker.record_success()
+        except (openai.APIConnectionError, openai.APIStatusError, httpx.HTTPError) as e:
+            # Failure while reading the stream; not retried since output was already sent
+            self.breaker.record_failure()
+            self.failures += 1
+            raise UpstreamError("The assistant's response was interrupted. Please try again.") from e
+        finally:
+            if trial:
+                self.breaker.release()
+            for limiter in reversed(acquired):
+                limiter.release()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": {"state": self.breaker.state, "consecutive_failures": self.breaker.failures,
+                        "trips": self.breaker.trips},
+            "global": self._global.stats(),
+            "models": {model: limiter.stats() for model, limiter in self._models.items()},
+        }
@@ -8,22 +8,38 @@ import json
 import re
 import logging
 import asyncio
-from typing import List, Dict, Any
+import time
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
-from app.agent import SYSTEM_PROMPT
+from app.answer_cache import AnswerCache, ToolResult, turn_key
+from app.fast_path import try_fast_path
+from app.history import limit_exchanges, split_exchanges, trim_history
+from app.indexes import contains_hebrew
+from app.llm_gateway import GatewayConfig, GatewayError, LLMGateway, create_client
+from app.profile import refresh_context, session_context
+from app.prompts import assemble, plan_prompt, prompt_stats
 from app.tool_schemas import TOOLS
+from app.tool_stream import StreamedToolCall, ToolCallAssembler
 from app.tools import (
     get_patient_details,
     get_medication_info,
     check_user_status,
-    get_alternatives
+    check_user_status_batch,
+    get_alternatives,
+    ASYNC_TOOLS
 )
-from app.database import USERS_DB
+from app.repository import get_repository
+from app.session_locks import SessionBusy, SessionLocks
+from app.sessions import create_session_store, run_sweeper
+from app.sse import SSEWriter, encode_content, encode_event
+from app.snapshots import last_reload_report, reload_snapshot
+from app.tool_exec import ToolRunner, parse_policies, run_blocking, run_repository_io, shutdown_pool
+from app.tool_cache import ToolResultCache, cache_key, data_version
 
 # Setup logging
 logging.basicConfig(
@@ -35,6 +51,14 @@ logger = logging.getLogger(__name__)
 # Constants
 MAX_INPUT_LENGTH = 1000
 MAX_MESSAGES_PER_SESSION = 50
+# Input-token budget per LLM request; older exchanges are dropped to fit
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "8000"))
+# LLM rounds per turn; the last one is made without tools
+MAX_AGENT_ROUNDS = int(os.getenv("MAX_AGENT_ROUNDS", "6"))
+# Sent when the last round still produces no answer
+ROUND_LIMIT_REPLY = ("I couldn't complete this request. Please try rephrasing your question, "
+                     "or ask a pharmacist for help.")
+ROUND_LIMIT_REPLY_HE = "לא הצלחתי להשלים את הבקשה. אנא נסחו את השאלה מחדש, או פנו לרוקח לעזרה."
 MAX_SESSIONS = 100
 
 # Load environment variables
@@ -43,8 +67,45 @@ api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise ValueError("OPENAI_API_KEY environment variable not set")
 
-client = AsyncOpenAI(api_key=api_key)
-app = FastAPI(title="Pharmacy Assistant API")
+# Tool result cache size (0 disables caching)
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2048"))
+
+# Session limits: idle sessions expire after the TTL, and the least recently
+# used sessions are evicted when the total history size exceeds the budget
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MEMORY_BUDGET_BYTES = int(os.getenv("SESSION_MEMORY_BUDGET_BYTES", str(64 * 1024 * 1024)))
+SESSION_SWEEP_INTERVAL = 60.0
+
+# Answer simple English stock / "my medications" questions from templates without the LLM.
+# Off by default: its replies always repeat the patient name, where the prompt's
+# templates use it on the first question only
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "false").lower() == "true"
+
+# Content deltas are coalesced into one SSE frame per interval or size threshold
+# (SSE_FLUSH_INTERVAL_MS=0 sends a frame per token)
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "30")) / 1000
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", "256"))
+
+# Put the patient profile in the session context so the first turn can skip get_patient_details
+PREFETCH_PATIENT_PROFILE = os.getenv("PREFETCH_PATIENT_PROFILE", "false").lower() == "true"
+
+# Upstream LLM access: concurrency limits, retries and circuit breaker (LLM_* settings)
+llm_config = GatewayConfig.from_env()
+llm = LLMGateway(create_client(api_key, llm_config), llm_config)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the idle-session sweeper for the lifetime of the server, then release resources."""
+    sweeper = asyncio.create_task(run_sweeper(chat_sessions, SESSION_SWEEP_INTERVAL))
+    yield
+    sweeper.cancel()
+    chat_sessions.close()
+    shutdown_pool()
+    await llm.close()
+
+
+app = FastAPI(title="Pharmacy Assistant API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -59,36 +120,39 @@ app.add_middleware(
 TOOL_MAP = {
     "get_medication_info": get_medication_info,
     "check_user_status": check_user_status,
+    "check_user_status_batch": check_user_status_batch,
     "get_alternatives": get_alternatives,
     "get_patient_details": get_patient_details
 }
 
-# In-memory session store
-chat_sessions: Dict[str, List[Dict[str, Any]]] = {}
+# Session store (SESSION_BACKEND=memory|sqlite)
+chat_sessions = create_session_store(
+    max_sessions=MAX_SESSIONS,
+    ttl_seconds=SESSION_TTL_SECONDS,
+    max_bytes=SESSION_MEMORY_BUDGET_BYTES,
+)
 
+# One turn at a time per session; later turns wait up to SESSION_LOCK_TIMEOUT_SECONDS
+session_locks = SessionLocks(timeout=float(os.getenv("SESSION_LOCK_TIMEOUT_SECONDS", "60")))
 
+tool_cache = ToolResultCache(max_entries=TOOL_CACHE_MAX_ENTRIES)
+
+# Final answers replayed for repeated (question, tool results) turns; off unless enabled
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+answer_cache = AnswerCache(max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024")))
+
+# Tools run inline, on the tool thread pool or as async variants (TOOL_POLICIES overrides per tool)
+tool_runner = ToolRunner(TOOL_MAP, ASYNC_TOOLS, parse_policies(os.getenv("TOOL_POLICIES", "")))
 
-def cleanup_old_sessions():
-    """
-    Remove oldest sessions if limit exceeded.
-    Keeps system from running out of memory.
-    
-    Note: Cleanup runs on new requests rather than background task
-    to keep deployment simple (no additional threads/workers needed).
-    In high-traffic production, consider using APScheduler or similar.
-    """
-    if len(chat_sessions) > MAX_SESSIONS:
-        # Remove oldest 20% of sessions
-        sessions_to_remove = list(chat_sessions.keys())[:MAX_SESSIONS // 5]
-        for session_id in sessions_to_remove:
-            del chat_sessions[session_id]
-            logger.info(f"Removed old session: {session_id}")
 
 
 async def execute_tool_call(tool_name: str, args: Dict[str, Any]) -> Dict[
     str, Any]:
     """
-    Execute a single tool call with error handling.
+    Execute a single tool call with error handling, under the tool's
+    execution policy (see app/tool_exec.py).
+    Results are served from tool_cache while the data they were computed
+    from is unchanged.
 
     Args:
         tool_name: Name of the tool to execute
@@ -98,9 +162,21 @@ async def execute_tool_call(tool_name: str, args: Dict[str, Any]) -> Dict[
         Tool execution result or error dictionary
     """
     try:
+        cacheable = tool_cache.cacheable(tool_name)
+        if cacheable:
+            key = cache_key(tool_name, args)
+            # Read versions before running the tool so concurrent changes invalidate the entry
+            version = await run_repository_io(data_version, get_repository(), tool_name, args)
+            cached = tool_cache.get(key, version)
+            if cached is not None:
+                logger.info(f"Tool {tool_name} served from cache with args: {args}")
+                return cached
+
         logger.info(f"Executing tool: {tool_name} with args: {args}")
-        result = await asyncio.to_thread(TOOL_MAP[tool_name], **args)
+        result = await tool_runner.run(tool_name, args)
         logger.info(f"Tool {tool_name} returned: {result}")
+        if cacheable:
+            tool_cache.put(key, version, result)
         return result
     except Exception as e:
         logger.error(f"Error executing tool {tool_name}: {str(e)}",
@@ -108,99 +184,292 @@ async def execute_tool_call(tool_name: str, args: Dict[str, Any]) -> Dict[
         return {"error": f"Tool execution failed: {str(e)}"}
 
 
-async def agent_loop(messages: List[Dict[str, Any]], session_id: str = "default"):
+def answer_stamp(messages: List[Dict[str, Any]], turn_tools: List[ToolResult],
+                 prompt_version: str, session_id: str) -> Tuple[Any, Any]:
+    """Answer cache key for the turn so far, and the catalog version it is valid for."""
+    return turn_key(messages, turn_tools, prompt_version, session_id), get_repository().catalog_version()
+
+
+async def timed_tool_call(tool_name: str, args: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    """Run execute_tool_call and return its result with the elapsed seconds."""
+    started = time.perf_counter()
+    result = await execute_tool_call(tool_name, args)
+    return result, time.perf_counter() - started
+
+
+async def agent_loop(messages: List[Dict[str, Any]], session_id: str = "default",
+                     sse: Optional[SSEWriter] = None):
     """
     Main agent loop that handles streaming responses and tool calls.
-    Implements parallel tool execution for better performance.
+    Runs up to MAX_AGENT_ROUNDS LLM rounds; the last allowed round is made
+    with tools disabled so the model has to answer. Tool calls start as
+    soon as their arguments have streamed in, and calls repeated within
+    the turn are answered from the earlier result. With the answer cache
+    on, a turn whose question and tool results match an earlier turn
+    replays that answer instead of making the final LLM round.
 
     Args:
         messages: Conversation history
         session_id: Session identifier for context (used for disclaimer enforcement)
+        sse: Frame writer (coalesces content deltas; per-token frames if omitted)
 
     Yields:
-        Server-sent events containing content chunks and tool call notifications
+        Server-sent events containing content chunks, tool call notifications
+        and a final {"stats": {"rounds", "deduped_tool_calls", "tool_latency_saved_ms",
+        "answer_cached"}} event
     """
-    try:
-        response = await client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=messages,
-            tools=TOOLS,
-            stream=True
-        )
+    sse = sse or SSEWriter(flush_interval=0)
+    # Tool executions started during this turn, keyed like the tool cache
+    turn_calls: Dict[Tuple[str, str], asyncio.Task] = {}
+    turn_tools: List[ToolResult] = []
+    rounds = 0
+    deduped = 0
+    latency_saved = 0.0
+    answer_cached = False
+
+    def schedule(call: StreamedToolCall, round_tasks: List[asyncio.Task]) -> Tuple[str, str]:
+        nonlocal deduped
+        key = cache_key(call.name, call.parsed)
+        if key in turn_calls:
+            deduped += 1
+            logger.info(f"Session {session_id} reusing result for {call.name} {call.parsed}")
+        else:
+            task = asyncio.create_task(timed_tool_call(call.name, call.parsed))
+            turn_calls[key] = task
+            round_tasks.append(task)
+        return key
 
-        tool_calls = []
-        current_content = ""
-
-        # Stream response and collect tool calls
-        async for chunk in response:
-            delta = chunk.choices[0].delta
-
-            if delta.content:
-                current_content += delta.content
-                yield f"data: {json.dumps({'content': delta.content})}\n\n"
-
-            if delta.tool_calls:
-                for tc in delta.tool_calls:
-                    if len(tool_calls) <= tc.index:
-                        tool_calls.append({
-                            "id": tc.id,
-                            "name": tc.function.name,
-                            "args": ""
-                        })
-                    if tc.function.arguments:
-                        tool_calls[tc.index]["args"] += tc.function.arguments
-
-        # Process tool calls if any
-        if tool_calls:
-            assistant_msg = {
+    try:
+        while rounds < MAX_AGENT_ROUNDS:
+            rounds += 1
+            final_round = rounds == MAX_AGENT_ROUNDS
+
+            prompt = plan_prompt(messages, record=False)
+
+            # Once tools have run, an identical earlier turn's answer can be replayed
+            answer_turn = None
+            if ANSWER_CACHE_ENABLED:
+                answer_turn, catalog = await run_repository_io(
+                    answer_stamp, messages, turn_tools, prompt.version, session_id)
+            if answer_turn is not None:
+                cached = answer_cache.get(answer_turn[0], catalog, answer_turn[1])
+                if cached is not None:
+                    logger.info(f"Session {session_id} answer served from cache")
+                    messages.append({"role": "assistant", "content": cached})
+                    answer_cached = True
+                    yield encode_content(cached)
+                    break
+
+            prompt_stats.record(prompt)
+            logger.info(f"Session {session_id} round {rounds} prompt {prompt.version}: {prompt.tokens} tokens "
+                        f"({prompt.tokens_saved} saved vs full prompt)")
+            request = trim_history(messages, MAX_INPUT_TOKENS - prompt.tokens)
+            if request.dropped_exchanges or request.compacted_exchanges:
+                logger.info(f"Session {session_id} request trimmed from {request.original_tokens} to "
+                            f"{request.tokens} tokens ({request.dropped_exchanges} exchanges dropped, "
+                            f"{request.compacted_exchanges} compacted)")
+
+            assembler = ToolCallAssembler()
+            keys: Dict[int, Tuple[str, str]] = {}
+            round_tasks: List[asyncio.Task] = []
+            current_content = ""
+
+            async with llm.stream(
+                model="gpt-5-mini",
+                messages=assemble(prompt, request.messages),
+                tools=TOOLS,
+                tool_choice="none" if final_round else "auto",
+            ) as response:
+                # Stream response; each tool call starts as soon as its arguments are complete
+                async for chunk in response:
+                    delta = chunk.choices[0].delta
+
+                    if delta.content:
+                        current_content += delta.content
+                        frame = sse.content(delta.content)
+                        if frame:
+                            yield frame
+
+                    if delta.tool_calls:
+                        for call in assembler.feed(delta.tool_calls):
+                            if not final_round:
+                                keys[call.index] = schedule(call, round_tasks)
+
+            stream_end = time.perf_counter()
+            pending = sse.flush()
+            if pending:
+                yield pending
+            for call in assembler.finish():
+                if not final_round:
+                    keys[call.index] = schedule(call, round_tasks)
+            tool_calls = assembler.calls
+
+            if final_round and not current_content.strip():
+                logger.warning(f"Session {session_id} reached {MAX_AGENT_ROUNDS} rounds without an answer")
+                user_text = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+                current_content = ROUND_LIMIT_REPLY_HE if contains_hebrew(user_text) else ROUND_LIMIT_REPLY
+                answer_turn = None
+                for frame in (sse.content(current_content), sse.flush()):
+                    if frame:
+                        yield frame
+
+            if not tool_calls:
+                # No tool calls, final response
+                messages.append({"role": "assistant", "content": current_content})
+                if answer_turn is not None:
+                    answer_cache.put(answer_turn[0], catalog, current_content, answer_turn[1])
+                break
+            if final_round:
+                logger.warning(f"Session {session_id} reached {MAX_AGENT_ROUNDS} rounds; "
+                               f"dropping {len(tool_calls)} tool calls")
+                messages.append({"role": "assistant", "content": current_content})
+                break
+
+            messages.append({
                 "role": "assistant",
                 "content": current_content,
                 "tool_calls": [
                     {
-                        "id": t["id"],
+                        "id": t.id,
                         "type": "function",
-                        "function": {"name": t["name"], "arguments": t["args"]}
+                        "function": {"name": t.name, "arguments": t.args}
                     }
                     for t in tool_calls
                 ]
-            }
-            messages.append(assistant_msg)
+            })
 
-            # Execute tools in parallel for better performance
-            tool_results = await asyncio.gather(*[
-                execute_tool_call(t["name"], json.loads(t["args"]))
-                for t in tool_calls
-            ])
+            await asyncio.gather(*(turn_calls[key] for key in set(keys.values())))
+            if round_tasks:
+                # Waiting for the stream to end before starting the slowest tool would cost this much more
+                saved = max(stream_end + max(t.result()[1] for t in round_tasks) - time.perf_counter(), 0.0)
+                latency_saved += saved
+                logger.info(f"Session {session_id} round {rounds}: {len(round_tasks)} tool calls overlapped "
+                            f"the stream, saving {saved * 1000:.1f}ms")
 
             # Add tool results to messages and notify UI
-            for tool_call, result in zip(tool_calls, tool_results):
+            for tool_call in tool_calls:
+                result, _ = turn_calls[keys[tool_call.index]].result()
+                turn_tools.append((tool_call.name, tool_call.parsed, result))
                 messages.append({
                     "role": "tool",
-                    "tool_call_id": tool_call["id"],
+                    "tool_call_id": tool_call.id,
                     "content": json.dumps(result)
                 })
-                yield f"data: {json.dumps({'tool': tool_call['name'], 'args': json.loads(tool_call['args'])})}\n\n"
+                yield sse.event({"tool": tool_call.name, "args": tool_call.parsed})
 
-            # Recursive call to get final response
-            async for next_chunk in agent_loop(messages, session_id):
-                yield next_chunk
-        else:
-            # No tool calls, final response
-            messages.append({"role": "assistant", "content": current_content})
+        stats = {"rounds": rounds, "deduped_tool_calls": deduped,
+                 "tool_latency_saved_ms": round(latency_saved * 1000, 1), "answer_cached": answer_cached}
+        yield sse.event({"stats": stats})
 
+    except GatewayError as e:
+        logger.warning(f"LLM request for session {session_id} failed: {e}")
+        yield sse.event({"error": str(e)})
     except Exception as e:
         logger.error(f"Error in agent loop: {str(e)}", exc_info=True)
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield sse.event({"error": str(e)})
+    finally:
+        for task in turn_calls.values():
+            task.cancel()
+
+
+async def session_io(function, *args):
+    """Call a session store function, on the tool thread pool if the store blocks on I/O."""
+    if chat_sessions.blocking_io:
+        return await run_blocking(function, *args)
+    return function(*args)
+
+
+def load_session(session_id: str, user_input: str) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Load (or start) a session's history and add the new user message.
+
+    Returns:
+        The history plus the user message, and the number of leading
+        messages already in the store
+    """
+    # Initialize session with context injection
+    messages = chat_sessions.get(session_id)
+    if messages is None:
+        # The system prompt is assembled per request, so only context is stored
+        messages = []
+
+        # Inject user context ONCE at session start if valid patient ID
+        context = session_context(session_id, PREFETCH_PATIENT_PROFILE)
+        if context is not None:
+            messages.append(context)
+            logger.info(f"User context injected for new session: {session_id}")
+        chat_sessions.create(session_id, messages)
+    elif PREFETCH_PATIENT_PROFILE and refresh_context(messages, session_id, prefetch=True):
+        chat_sessions.replace(session_id, messages)
+
+    # Limit stored history, dropping whole exchanges so tool calls keep their replies
+    trimmed = limit_exchanges(messages, MAX_MESSAGES_PER_SESSION)
+    if trimmed is not None:
+        messages = trimmed
+        chat_sessions.replace(session_id, messages)
+        logger.info(f"Session {session_id} history trimmed to {len(messages)} messages")
+
+    # Add user message; it is stored with the rest of the turn's messages
+    saved = len(messages)
+    user_msg = {"role": "user", "content": user_input}
+    messages.append(user_msg)
+    return messages, saved
+
+
+async def stream_turn(user_input: str, session_id: str, per_token: bool = False):
+    """
+    Stream one chat turn, then append the turn's new messages to the session store.
+    Simple questions are answered by the fast path; the rest go to agent_loop.
+
+    The session's lock is held from loading the history until the new
+    messages are stored, so turns on one session run one at a time.
+
+    Args:
+        user_input: User's message
+        session_id: Session identifier
+        per_token: Send one frame per content delta instead of coalescing
+    """
+    sse = SSEWriter(flush_interval=0 if per_token else SSE_FLUSH_INTERVAL, flush_bytes=SSE_FLUSH_BYTES)
+    try:
+        async with session_locks.hold(session_id):
+            # Starting a session also reads the patient context from the repository
+            if chat_sessions.blocking_io or get_repository().blocking_io:
+                messages, saved = await run_blocking(load_session, session_id, user_input)
+            else:
+                messages, saved = load_session(session_id, user_input)
+            try:
+                answer = None
+                if FAST_PATH_ENABLED:
+                    answer = await try_fast_path(user_input, session_id, execute_tool_call)
+                if answer is not None:
+                    for call_id, name, args, result in answer.tool_calls:
+                        yield encode_event({"tool": name, "args": args})
+                    messages.extend(answer.to_messages())
+                    yield encode_content(answer.content)
+                else:
+                    async for chunk in agent_loop(messages, session_id, sse):
+                        yield chunk
+            finally:
+                # A turn cut short (cancelled, upstream error) may end on tool calls
+                # without replies; store only its complete exchanges
+                _, exchanges = split_exchanges(messages[saved:])
+                # Shielded so a client disconnect can't cancel the write halfway
+                await asyncio.shield(session_io(chat_sessions.append, session_id,
+                                                [m for exchange in exchanges for m in exchange]))
+    except SessionBusy as e:
+        # The message was not stored; "busy" tells the UI it can be sent again
+        yield sse.event({"error": str(e), "busy": True})
 
 
 @app.post("/chat")
-async def chat(user_input: str, session_id: str = "default"):
+async def chat(user_input: str, session_id: str = "default", per_token: bool = False):
     """
     Handle chat requests with streaming responses.
 
     Args:
         user_input: User's message
         session_id: Session identifier (use patient ID for authenticated sessions)
+        per_token: Stream one frame per token instead of coalesced frames
 
     Returns:
         Streaming response with server-sent events
@@ -221,38 +490,8 @@ async def chat(user_input: str, session_id: str = "default"):
     logger.info(
         f"Chat request - session_id: {session_id}, input: {user_input[:100]}")
 
-    # Cleanup old sessions periodically
-    cleanup_old_sessions()
-
-    # Initialize session with context injection
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = [
-            {"role": "system", "content": SYSTEM_PROMPT}
-        ]
-        
-        # Inject user context ONCE at session start if valid patient ID
-        if session_id in USERS_DB:
-            chat_sessions[session_id].append({
-                "role": "system",
-                "content": f"CONTEXT UPDATE: CURRENT_USER_ID is {session_id}. Patient is authenticated."
-            })
-            logger.info(f"User context injected for new session: {session_id}")
-
-    # Limit session history to prevent memory issues
-    if len(chat_sessions[session_id]) > MAX_MESSAGES_PER_SESSION:
-        # Keep system prompt + context + last N messages
-        system_messages = [msg for msg in chat_sessions[session_id] if msg["role"] == "system"]
-        recent_messages = chat_sessions[session_id][-MAX_MESSAGES_PER_SESSION:]
-        chat_sessions[session_id] = system_messages + recent_messages
-        logger.info(f"Session {session_id} history trimmed to {len(chat_sessions[session_id])} messages")
-
-    # Add user message to persistent session
-    user_msg = {"role": "user", "content": user_input}
-    chat_sessions[session_id].append(user_msg)
-
-    # Use session history directly (no copy needed)
     return StreamingResponse(
-        agent_loop(chat_sessions[session_id], session_id),
+        stream_turn(user_input, session_id, per_token),
         media_type="text/event-stream"
     )
 
@@ -265,8 +504,53 @@ async def health_check():
 
 @app.get("/sessions")
 async def list_sessions():
-    """List active session IDs (for debugging)."""
-    return {"active_sessions": list(chat_sessions.keys())}
+    """List active session IDs (for debugging), with store and turn lock metrics."""
+    return {"active_sessions": await session_io(chat_sessions.session_ids),
+            **await session_io(chat_sessions.stats),
+            "turn_locks": session_locks.stats()}
+
+
+@app.post("/admin/reload")
+async def reload_data():
+    """
+    Rebuild patient and catalog data and swap it in without a restart.
+    Chat sessions and in-flight tool calls are unaffected.
+    """
+    try:
+        return await asyncio.to_thread(reload_snapshot)
+    except Exception as e:
+        logger.error(f"Data reload failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Reload failed: {str(e)}")
+
+
+@app.get("/admin/reload")
+async def reload_status():
+    """Report from the most recent data reload."""
+    return {"last_reload": last_reload_report()}
+
+
+@app.get("/prompt/stats")
+async def prompt_usage():
+    """System prompt tokens sent and saved by per-turn section selection."""
+    return prompt_stats.to_dict()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Tool result cache counters (for tuning size and TTLs)."""
+    return tool_cache.stats()
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Upstream LLM gateway counters: slots, queue, retries and circuit state."""
+    return llm.stats()
+
+
+@app.get("/cache/answers")
+async def answer_cache_stats():
+    """Answer cache counters."""
+    return {"enabled": ANSWER_CACHE_ENABLED, **answer_cache.stats()}
 
 
 if __name__ == "__main__":
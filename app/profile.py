@@ -0,0 +1,107 @@
+"""
+Session context for authenticated patients.
+
+Every patient session starts with a CURRENT_USER_ID context message. With
+prefetching enabled, the message also carries a compact patient profile
+(the same data get_patient_details returns, plus the Hebrew name), so the
+model can skip that tool round on the first turn. Profiles are cached per
+patient and rebuilt when the patient record version changes. With the
+SQLite backend that version is stored in the database, so a profile is
+also rebuilt after another worker or the importer changes the record.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, Any]
+
+CONTEXT_PREFIX = "CONTEXT UPDATE: CURRENT_USER_ID is"
+PROFILE_CACHE_MAX_ENTRIES = 1024
+
+# user_id -> ((repository generation, patient record version), context message).
+# Sessions can load on tool pool threads (blocking backends), so every access
+# holds _profiles_lock
+_profiles: "OrderedDict[str, Tuple[Tuple[int, int], Message]]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def patient_profile(user_id: str) -> Optional[Dict[str, Any]]:
+    """Compact profile of a patient, or None if the patient is unknown."""
+    patient = get_repository().get_patient(user_id)
+    if patient is None:
+        return None
+    return {
+        "name": patient.name,
+        "name_hebrew": patient.name_hebrew,
+        "history": patient.history or "No medical history available.",
+        "current_prescriptions": [p.name for p in patient.prescriptions],
+        "allergies": list(patient.allergies),
+    }
+
+
+def _render(user_id: str, profile: Optional[Dict[str, Any]]) -> Message:
+    content = f"{CONTEXT_PREFIX} {user_id}. Patient is authenticated."
+    if profile is not None:
+        content += ("\nPATIENT PROFILE (current get_patient_details data; do not call get_patient_details "
+                    f"for it): {json.dumps(profile, ensure_ascii=False)}")
+    return {"role": "system", "content": content}
+
+
+def session_context(user_id: str, prefetch: bool = False) -> Optional[Message]:
+    """
+    Context message for a patient session.
+
+    Args:
+        user_id: Session patient ID
+        prefetch: Include the patient profile
+
+    Returns:
+        The system message, or None if user_id is not a known patient
+    """
+    repository = get_repository()
+    if not repository.patient_exists(user_id):
+        return None
+    if not prefetch:
+        return _render(user_id, None)
+
+    # Read before the profile, so a change made while it is built invalidates the entry
+    version = (repository.generation, repository.patient_version(user_id))
+    with _profiles_lock:
+        cached = _profiles.get(user_id)
+        if cached is not None and cached[0] == version:
+            _profiles.move_to_end(user_id)
+            return cached[1]
+
+    # Built outside the lock, so a slow read doesn't hold up other sessions
+    message = _render(user_id, patient_profile(user_id))
+    with _profiles_lock:
+        _profiles[user_id] = (version, message)
+        _profiles.move_to_end(user_id)
+        while len(_profiles) > PROFILE_CACHE_MAX_ENTRIES:
+            _profiles.popitem(last=False)
+    return message
+
+
+def refresh_context(messages: List[Message], user_id: str, prefetch: bool = False) -> bool:
+    """
+    Replace a stale context message in a session history in place.
+
+    Returns:
+        True if the history changed
+    """
+    current = session_context(user_id, prefetch)
+    for i, message in enumerate(messages):
+        if message.get("role") == "system" and (message.get("content") or "").startswith(CONTEXT_PREFIX):
+            if current is None or message.get("content") == current["content"]:
+                return False
+            messages[i] = current
+            logger.info(f"Patient context refreshed for session {user_id}")
+            return True
+    return False
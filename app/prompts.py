@@ -0,0 +1,139 @@
+"""
+Per-turn system prompt assembly.
+
+Every request starts with CORE_PROMPT as a constant first message, so the
+prompt prefix (core plus the conversation so far) is byte-identical from
+request to request and can be served from the provider's prompt cache.
+Sections only some turns need (Hebrew formatting, alternatives, the
+not-found protocol) are picked by a cheap local classifier and sent as a
+trailing system message after the history, where they don't disturb the
+cached prefix.
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.agent import CORE_PROMPT, CORE_PROMPT_VERSION, PROMPT_SECTIONS, SYSTEM_PROMPT
+from app.history import message_tokens
+from app.indexes import contains_hebrew
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, Any]
+
+# Whole phrases only: bare "other", "else" or "אחר" also appear in ordinary sentences
+_ALTERNATIVES_PATTERN = re.compile(
+    r"\b(alternatives?|substitutes?|replacements?)\b"
+    r"|\b(instead of|something else|anything else (for|instead)|other (options?|brands?)"
+    r"|similar (to|medications?|drugs?))\b"
+    r"|חלופ|תחליף|במקום|משהו אחר|תרופה אחרת",
+    re.IGNORECASE,
+)
+_NOT_FOUND_PATTERN = re.compile(r"not found|did_you_mean", re.IGNORECASE)
+
+_CORE_MESSAGE: Message = {"role": "system", "content": CORE_PROMPT}
+_SECTION_TEXT = {name: text for name, _, text in PROMPT_SECTIONS}
+_SECTION_VERSIONS = {name: version for name, version, _ in PROMPT_SECTIONS}
+_FULL_PROMPT_TOKENS = message_tokens({"role": "system", "content": SYSTEM_PROMPT})
+
+
+@dataclass
+class PromptPlan:
+    """System messages for one request."""
+    core: Message
+    turn: Optional[Message]
+    sections: Tuple[str, ...]
+    version: str
+    tokens: int
+    tokens_saved: int
+
+
+def _recent_turns(messages: Sequence[Message]) -> Tuple[str, List[Message]]:
+    """Return the latest user text and every message since the previous user message."""
+    user_indexes = [i for i, m in enumerate(messages) if m.get("role") == "user"]
+    if not user_indexes:
+        return "", []
+    start = user_indexes[-2] + 1 if len(user_indexes) > 1 else 0
+    return messages[user_indexes[-1]].get("content") or "", list(messages[start:])
+
+
+def classify_turn(messages: Sequence[Message]) -> Tuple[str, ...]:
+    """
+    Pick the optional prompt sections a turn needs.
+
+    - hebrew: the latest user message contains Hebrew
+    - alternatives: the user asks for alternatives, or get_alternatives was
+      called this turn or last turn
+    - not_found: a tool reported a missing medication this turn or last
+      turn (so a "yes" to a did_you_mean suggestion is still covered)
+    """
+    user_text, recent = _recent_turns(messages)
+    tool_names = {call.get("function", {}).get("name")
+                  for m in recent for call in m.get("tool_calls") or ()}
+    tool_results = [m.get("content") or "" for m in recent if m.get("role") == "tool"]
+
+    selected = set()
+    if contains_hebrew(user_text):
+        selected.add("hebrew")
+    if "get_alternatives" in tool_names or _ALTERNATIVES_PATTERN.search(user_text):
+        selected.add("alternatives")
+    if any(_NOT_FOUND_PATTERN.search(result) for result in tool_results):
+        selected.add("not_found")
+    return tuple(name for name, _, _ in PROMPT_SECTIONS if name in selected)
+
+
+class PromptStats:
+    """Running totals of prompt tokens sent and saved versus the full prompt."""
+
+    def __init__(self):
+        self.requests = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self.sections: Dict[str, int] = {name: 0 for name, _, _ in PROMPT_SECTIONS}
+
+    def record(self, plan: PromptPlan) -> None:
+        self.requests += 1
+        self.tokens_sent += plan.tokens
+        self.tokens_saved += plan.tokens_saved
+        for name in plan.sections:
+            self.sections[name] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "full_prompt_tokens": _FULL_PROMPT_TOKENS,
+            "prompt_tokens_sent": self.tokens_sent,
+            "prompt_tokens_saved": self.tokens_saved,
+            "avg_saved_per_request": round(self.tokens_saved / self.requests, 1) if self.requests else 0.0,
+            "section_requests": dict(self.sections),
+        }
+
+
+prompt_stats = PromptStats()
+
+
+def plan_prompt(messages: Sequence[Message], record: bool = True) -> PromptPlan:
+    """
+    Choose the system messages for a request over the given history.
+    With record=False the plan is not counted in prompt_stats until the
+    caller records it (for plans that may not be sent).
+    """
+    sections = classify_turn(messages)
+    turn = None
+    if sections:
+        turn = {"role": "system", "content": "".join(_SECTION_TEXT[name] for name in sections)}
+    tokens = message_tokens(_CORE_MESSAGE) + (message_tokens(turn) if turn else 0)
+    version = "+".join([f"core@{CORE_PROMPT_VERSION}"] +
+                       [f"{name}@{_SECTION_VERSIONS[name]}" for name in sections])
+    plan = PromptPlan(_CORE_MESSAGE, turn, sections, version, tokens,
+                      max(_FULL_PROMPT_TOKENS - tokens, 0))
+    if record:
+        prompt_stats.record(plan)
+    return plan
+
+
+def assemble(plan: PromptPlan, history: List[Message]) -> List[Message]:
+    """Core prompt, then the (trimmed) history, then this turn's sections."""
+    return [plan.core] + history + ([plan.turn] if plan.turn else [])
@@ -0,0 +1,143 @@
+"""
+Record types for patients, prescriptions and medications.
+
+Frozen, slotted dataclasses replace the dict-of-dicts shape of
+app/database.py: no per-instance __dict__, and repeated strings (drug
+classes, ingredients, allergies, prescription names) are interned so
+millions of records share one copy of each.
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+
+def _intern(value: Optional[str]) -> str:
+    return sys.intern(value) if value else ""
+
+
+@dataclass(frozen=True, slots=True)
+class Prescription:
+    """A prescription on file for a patient (name is the catalog key)."""
+    name: str
+    instructions: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class Patient:
+    """A patient record with allergies and prescriptions."""
+    id: str
+    name: str
+    name_hebrew: str
+    allergies: Tuple[str, ...] = ()
+    prescriptions: Tuple[Prescription, ...] = ()
+    history: str = ""
+
+    def prescription_for(self, med_key: str) -> Optional[Prescription]:
+        """Return the prescription for a medication, or None if not on file."""
+        return next((rx for rx in self.prescriptions if rx.name == med_key), None)
+
+
+@dataclass(frozen=True, slots=True)
+class Medication:
+    """A catalog medication record."""
+    sku: str
+    name: str
+    name_hebrew: str
+    drug_class: str
+    active_ingredients: str
+    requires_rx: bool = True
+    stock_level: int = 0
+    restrictions: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record in the MEDICATIONS_DB dict shape used by tool output."""
+        return {
+            "sku": self.sku,
+            "name": self.name,
+            "name_hebrew": self.name_hebrew,
+            "drug_class": self.drug_class,
+            "active_ingredients": self.active_ingredients,
+            "requires_rx": self.requires_rx,
+            "stock_level": self.stock_level,
+            "restrictions": self.restrictions,
+        }
+
+
+def make_patient(
+        user_id: str,
+        name: str,
+        name_hebrew: Optional[str] = None,
+        allergies: Iterable[str] = (),
+        prescriptions: Iterable[Tuple[str, Optional[str]]] = (),
+        history: Optional[str] = None
+) -> Patient:
+    """Build a Patient with interned allergy and prescription strings."""
+    return Patient(
+        id=user_id,
+        name=name,
+        name_hebrew=name_hebrew or name,
+        allergies=tuple(_intern(a) for a in allergies),
+        prescriptions=tuple(Prescription(_intern(rx_name), instructions or "")
+                            for rx_name, instructions in prescriptions),
+        history=history or "",
+    )
+
+
+def make_medication(
+        sku: Optional[str],
+        name: str,
+        name_hebrew: Optional[str],
+        drug_class: Optional[str],
+        active_ingredients: Optional[str],
+        requires_rx: Any = True,
+        stock_level: Any = 0,
+        restrictions: Optional[str] = None
+) -> Medication:
+    """Build a Medication with interned drug-class and ingredient strings."""
+    return Medication(
+        sku=sku or "",
+        name=name,
+        name_hebrew=name_hebrew or "",
+        drug_class=_intern(drug_class),
+        active_ingredients=_intern(active_ingredients),
+        requires_rx=bool(requires_rx),
+        stock_level=int(stock_level),
+        restrictions=_intern(restrictions),
+    )
+
+
+def patient_from_dict(user: Mapping[str, Any]) -> Patient:
+    """Convert a USERS_DB-style dict into a Patient."""
+    return make_patient(
+        user["id"],
+        user.get("name", "Unknown"),
+        user.get("name_hebrew"),
+        user.get("allergies", []),
+        [(rx["name"], rx.get("instructions")) for rx in user.get("prescriptions", [])],
+        user.get("history"),
+    )
+
+
+def medication_from_dict(med: Mapping[str, Any]) -> Medication:
+    """Convert a MEDICATIONS_DB-style dict into a Medication."""
+    return make_medication(
+        med.get("sku"),
+        med["name"],
+        med.get("name_hebrew"),
+        med.get("drug_class"),
+        med.get("active_ingredients"),
+        med.get("requires_rx", True),
+        med.get("stock_level", 0),
+        med.get("restrictions"),
+    )
+
+
+def load_patients(users: Mapping[str, Mapping[str, Any]]) -> Dict[str, Patient]:
+    """Convert a USERS_DB-style mapping into Patient records keyed by ID."""
+    return {user_id: patient_from_dict(user) for user_id, user in users.items()}
+
+
+def load_medications(medications: Mapping[str, Mapping[str, Any]]) -> Dict[str, Medication]:
+    """Convert a MEDICATIONS_DB-style mapping into Medication records keyed by name."""
+    return {med_key: medication_from_dict(med) for med_key, med in medications.items()}
@@ -0,0 +1,645 @@
+"""
+Data access layer for patient and medication records.
+Tools read data through a Repository so the backing store can be swapped
+without touching tool logic.
+
+Backends:
+- memory (default): the dicts in app/database.py with prebuilt indexes,
+  or an mmap'd catalog file shared across workers (PHARMACY_CATALOG_PATH)
+- sqlite: indexed tables on disk, for patient bases that don't fit in RAM
+
+Select with PHARMACY_DB_BACKEND=memory|sqlite and PHARMACY_DB_PATH.
+"""
+
+import os
+import json
+import sqlite3
+import itertools
+import threading
+import weakref
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Mapping, MutableMapping, Optional, Tuple
+
+from app.catalog_file import MappedCatalog
+from app.database import USERS_DB, MEDICATIONS_DB
+from app.fuzzy import DEFAULT_SUGGESTIONS, FuzzyNameIndex
+from app.indexes import (
+    AllergyProfileCache,
+    MedicationIndex,
+    MedicationTraits,
+    find_allergy_conflict,
+    normalize_name,
+    parse_ingredients,
+)
+from app.inventory import InsufficientStockError, InventoryStore
+from app.records import (
+    Medication,
+    Patient,
+    load_medications,
+    load_patients,
+    make_medication,
+    make_patient,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "memory"
+DEFAULT_SQLITE_PATH = "pharmacy.db"
+
+# Distinguishes repository instances in version stamps, so results computed
+# against a replaced repository are never mistaken for current ones
+_generations = itertools.count(1)
+
+
+class Repository(ABC):
+    """
+    Read interface over patients, prescriptions, allergies and medications.
+    Live stock levels come from `inventory`, which overlays the catalog's stock_level.
+
+    Version counters let caches detect stale data: the catalog version
+    changes with any medication or stock change, and each patient's version
+    changes when that patient's record is updated. The base counters live
+    in this process; backends shared with other processes store them with
+    the data.
+    """
+
+    # True if reads block on I/O, so tools should not run on the event loop
+    blocking_io = False
+
+    def __init__(self, inventory: Optional[InventoryStore] = None):
+        self.inventory = inventory or InventoryStore()
+        self.generation = next(_generations)
+        self._allergy_profiles = AllergyProfileCache()
+        self._catalog_version = 0
+        self._patient_versions: Dict[str, int] = {}
+        self._patient_version_counter = itertools.count(1)
+        self._fuzzy_index: Optional[FuzzyNameIndex] = None
+        self._fuzzy_lock = threading.Lock()
+
+    @abstractmethod
+    def get_patient(self, user_id: str) -> Optional[Patient]:
+        """Return a patient record, or None if unknown."""
+
+    @abstractmethod
+    def _write_patient(self, patient: Patient) -> None:
+        """Store a new or changed patient record."""
+
+    def update_patient(self, patient: Patient) -> None:
+        """Insert or replace a patient record and bump that patient's version."""
+        self._write_patient(patient)
+        self.touch_patient(patient.id)
+        logger.info(f"Patient record updated: {patient.id}")
+
+    def touch_patient(self, user_id: str) -> None:
+        """Mark a patient's record as changed."""
+        self._patient_versions[user_id] = next(self._patient_version_counter)
+
+    def patient_version(self, user_id: str) -> int:
+        """Version of a patient's record (0 until it first changes)."""
+        return self._patient_versions.get(user_id, 0)
+
+    def touch_catalog(self) -> None:
+        """Mark the medication catalog as changed."""
+        self._catalog_version += 1
+
+    def catalog_version(self) -> Tuple[int, int, int]:
+        """Version of the medication catalog, including live stock."""
+        return self.generation, self._catalog_version, self.inventory.version
+
+    @abstractmethod
+    def patient_exists(self, user_id: str) -> bool:
+        """Return True if the patient ID is known."""
+
+    @abstractmethod
+    def find_medication(self, name: str) -> Tuple[Optional[str], Optional[Medication]]:
+        """Resolve an English name, Hebrew name or SKU to (catalog key, record)."""
+
+    @abstractmethod
+    def medication_traits(self, med_key: str) -> MedicationTraits:
+        """Return canonical ingredient, class and conflict IDs of a medication."""
+
+    @abstractmethod
+    def medication_names(self) -> Iterable[Tuple[str, str]]:
+        """Yield (display name, catalog key) for every English and Hebrew name."""
+
+    @abstractmethod
+    def find_alternatives(
+            self,
+            active_ingredient: str,
+            exclude_med_key: Optional[str] = None,
+            exclude_drug_classes: Iterable[str] = ()
+    ) -> List[str]:
+        """Return names of medications with the ingredient, in catalog order."""
+
+    def suggest_medications(self, name: str, limit: int = DEFAULT_SUGGESTIONS) -> List[str]:
+        """
+        Return catalog names closest to a misspelled query, best first.
+        The fuzzy index is built on first use.
+        """
+        if self._fuzzy_index is None:
+            with self._fuzzy_lock:
+                if self._fuzzy_index is None:
+                    self._fuzzy_index = FuzzyNameIndex(self.medication_names())
+        return self._fuzzy_index.suggest(name, limit)
+
+    def allergy_conflict(self, patient: Patient, med_key: str, med: Medication) -> Optional[str]:
+        """Check a patient's allergies against a medication."""
+        profile = self._allergy_profiles.get(patient.id, patient.allergies)
+        return find_allergy_conflict(profile, self.medication_traits(med_key), med.drug_class,
+                                     med.active_ingredients)
+
+
+class InMemoryRepository(Repository):
+    """
+    Repository over in-process data.
+    A dict catalog is indexed once at construction; a MappedCatalog is its
+    own index and needs no build step.
+    """
+
+    def __init__(self,
+                 users: MutableMapping[str, Patient],
+                 medications: Mapping[str, Medication]):
+        super().__init__()
+        self._users = users
+        self._medications = medications
+        self._index = medications if isinstance(medications, MappedCatalog) else MedicationIndex(medications)
+
+    def adopt_inventory(self, previous: "InMemoryRepository") -> int:
+        """
+        Take over a replaced repository's live stock levels, so decrements and
+        restocks (including those of calls still running against it) survive a
+        reload. Levels of medications no longer in the catalog are dropped.
+
+        Returns:
+            Number of stock levels kept
+        """
+        self.inventory = previous.inventory
+        return self.inventory.retain(self._medications)
+
+    def get_patient(self, user_id: str) -> Optional[Patient]:
+        return self._users.get(user_id)
+
+    def _write_patient(self, patient: Patient) -> None:
+        self._users[patient.id] = patient
+
+    def patient_exists(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def find_medication(self, name: str) -> Tuple[Optional[str], Optional[Medication]]:
+        return self._index.lookup(name)
+
+    def medication_traits(self, med_key: str) -> MedicationTraits:
+        return self._index.traits(med_key)
+
+    def medication_names(self) -> Iterable[Tuple[str, str]]:
+        for med_key, med in self._medications.items():
+            yield med.name, med_key
+            if med.name_hebrew:
+                yield med.name_hebrew, med_key
+
+    def find_alternatives(
+            self,
+            active_ingredient: str,
+            exclude_med_key: Optional[str] = None,
+            exclude_drug_classes: Iterable[str] = ()
+    ) -> List[str]:
+        # Posting-list lookup on the ingredient index; exclusions are set differences
+        matches = self._index.with_ingredients(active_ingredient)
+        matches -= self._index.in_drug_classes(exclude_drug_classes)
+        matches.discard(exclude_med_key)
+        return [self._medications[med_key].name
+                for med_key in self._index.in_catalog_order(matches)]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_hebrew TEXT,
+    history TEXT
+);
+CREATE TABLE IF NOT EXISTS prescriptions (
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    med_name TEXT NOT NULL,
+    instructions TEXT,
+    PRIMARY KEY (user_id, position)
+);
+CREATE TABLE IF NOT EXISTS allergies (
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    allergy TEXT NOT NULL,
+    PRIMARY KEY (user_id, position)
+);
+CREATE TABLE IF NOT EXISTS medications (
+    med_key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    sku TEXT,
+    name TEXT NOT NULL,
+    name_hebrew TEXT,
+    drug_class TEXT,
+    active_ingredients TEXT,
+    requires_rx INTEGER NOT NULL,
+    stock_level INTEGER NOT NULL,
+    restrictions TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_medications_position ON medications (position);
+CREATE TABLE IF NOT EXISTS medication_lookup (
+    lookup_key TEXT PRIMARY KEY,
+    med_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_medication_lookup_med ON medication_lookup (med_key);
+CREATE TABLE IF NOT EXISTS medication_terms (
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    med_key TEXT NOT NULL,
+    PRIMARY KEY (kind, term, med_key)
+);
+CREATE INDEX IF NOT EXISTS idx_medication_terms_med ON medication_terms (med_key, kind);
+CREATE TABLE IF NOT EXISTS patient_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_version VALUES (0, 0);
+"""
+
+# Version counters are bumped by triggers, so every writer (other workers,
+# app/importer.py, manual SQL) invalidates the caches of every process
+_BUMP_PATIENT = ("INSERT INTO patient_versions VALUES ({user_id}, 1) "
+                 "ON CONFLICT(user_id) DO UPDATE SET version = version + 1")
+_BUMP_CATALOG = "UPDATE catalog_version SET version = version + 1"
+_VERSION_TRIGGERS = "".join(
+    f"CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table} "
+    f"BEGIN {bump.format(user_id='OLD.user_id' if event == 'DELETE' else 'NEW.user_id')}; END;\n"
+    for tables, bump in ((("patients", "prescriptions", "allergies"), _BUMP_PATIENT),
+                         (("medications", "medication_lookup", "medication_terms"), _BUMP_CATALOG))
+    for table in tables
+    for event in ("INSERT", "UPDATE", "DELETE")
+)
+
+# Term kinds stored in medication_terms
+TERM_INGREDIENT = "ingredient"
+TERM_CLASS = "class"
+TERM_CONFLICT = "conflict"
+
+# Fixed SQL text so sqlite3's per-connection statement cache reuses the
+# prepared statements across calls
+_SELECT_PATIENT = "SELECT user_id, name, name_hebrew, history FROM patients WHERE user_id = ?"
+_SELECT_PATIENT_EXISTS = "SELECT 1 FROM patients WHERE user_id = ?"
+_SELECT_PRESCRIPTIONS = ("SELECT med_name, instructions FROM prescriptions "
+                         "WHERE user_id = ? ORDER BY position")
+_SELECT_ALLERGIES = "SELECT allergy FROM allergies WHERE user_id = ? ORDER BY position"
+_SELECT_MEDICATION_BY_LOOKUP = (
+    "SELECT m.med_key, m.sku, m.name, m.name_hebrew, m.drug_class, m.active_ingredients, "
+    "m.requires_rx, m.stock_level, m.restrictions "
+    "FROM medication_lookup l JOIN medications m ON m.med_key = l.med_key "
+    "WHERE l.lookup_key = ?"
+)
+_SELECT_TERMS = "SELECT kind, term FROM medication_terms WHERE med_key = ?"
+_SELECT_NAMES = "SELECT med_key, name, name_hebrew FROM medications ORDER BY position"
+_SELECT_STOCK = "SELECT stock_level FROM medications WHERE med_key = ?"
+_SELECT_STOCKS = ("SELECT med_key, stock_level FROM medications "
+                  "WHERE med_key IN (SELECT value FROM json_each(?))")
+_UPDATE_STOCK = "UPDATE medications SET stock_level = ? WHERE med_key = ?"
+_DECREMENT_STOCK = ("UPDATE medications SET stock_level = stock_level - ?1 "
+                    "WHERE med_key = ?2 AND stock_level >= ?1")
+_RESTOCK = "UPDATE medications SET stock_level = stock_level + ? WHERE med_key = ?"
+_SELECT_PATIENT_VERSION = "SELECT version FROM patient_versions WHERE user_id = ?"
+_SELECT_CATALOG_VERSION = "SELECT version FROM catalog_version"
+
+
+def _close_all(connections: List[sqlite3.Connection], lock: threading.Lock) -> None:
+    with lock:
+        for conn in connections:
+            conn.close()
+        connections.clear()
+
+
+class SqliteInventory(InventoryStore):
+    """
+    Stock levels stored in the medications.stock_level column.
+
+    Every worker sharing the database reads and updates the same rows:
+    decrements and restocks are single UPDATE statements, so concurrent
+    writers in any process never overwrite each other, and levels are
+    always read from the row. The `default` arguments of the InventoryStore
+    interface only apply to keys with no row.
+    """
+
+    def __init__(self, connection: Callable[[], sqlite3.Connection]):
+        """
+        Args:
+            connection: Returns the calling thread's database connection
+        """
+        super().__init__(stripes=1)
+        self._connection = connection
+
+    def level(self, med_key: str, default: int) -> int:
+        row = self._connection().execute(_SELECT_STOCK, (med_key,)).fetchone()
+        return row[0] if row else default
+
+    def levels(self, defaults: Mapping[str, int]) -> Dict[str, int]:
+        # One statement, so the batch sees one consistent state
+        rows = dict(self._connection().execute(_SELECT_STOCKS, (json.dumps(list(defaults)),)))
+        return {key: rows.get(key, default) for key, default in defaults.items()}
+
+    def _update(self, med_key: str, sql: str, quantity: int) -> Tuple[bool, int]:
+        """Run a stock UPDATE and read the level back in the same transaction."""
+        if quantity <= 0:
+            raise ValueError(f"Quantity must be positive, got {quantity}")
+        conn = self._connection()
+        with conn:
+            updated = conn.execute(sql, (quantity, med_key)).rowcount
+            row = conn.execute(_SELECT_STOCK, (med_key,)).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown medication: {med_key}")
+        if updated:
+            self._changed()
+        return bool(updated), row[0]
+
+    def decrement(self, med_key: str, quantity: int, default: int) -> int:
+        updated, level = self._update(med_key, _DECREMENT_STOCK, quantity)
+        if not updated:
+            raise InsufficientStockError(
+                f"Only {level} units of {med_key} in stock, requested {quantity}")
+        return level
+
+    def restock(self, med_key: str, quantity: int, default: int) -> int:
+        return self._update(med_key, _RESTOCK, quantity)[1]
+
+    def apply_feed(self, feed: Iterable[Tuple[str, int]]) -> int:
+        updates = {}
+        for med_key, level in feed:
+            if level < 0:
+                raise ValueError(f"Negative stock level for {med_key}: {level}")
+            updates[med_key] = int(level)
+        conn = self._connection()
+        with conn:
+            conn.executemany(_UPDATE_STOCK, [(level, med_key) for med_key, level in updates.items()])
+        self._changed()
+        logger.info(f"Applied stock feed with {len(updates)} levels")
+        return len(updates)
+
+
+class SqliteRepository(Repository):
+    """
+    Repository backed by a SQLite database.
+
+    Each thread gets its own connection (tools run on the tool thread pool),
+    and all queries are parameterized with fixed SQL so prepared statements
+    are reused from the connection's statement cache. Catalog and patient
+    versions are read from the database (see _VERSION_TRIGGERS), so changes
+    made by other processes invalidate this process's caches.
+    """
+
+    blocking_io = True
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        # A weak reference, so the repository is freed as soon as the last
+        # caller drops it (e.g. after a reload) rather than by the cycle collector
+        connection = weakref.WeakMethod(self._connection)
+        super().__init__(SqliteInventory(lambda: connection()()))
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Closes every thread's connection on close() or when the repository is freed
+        self._close_connections = weakref.finalize(self, _close_all, self._connections, self._connections_lock)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA + _VERSION_TRIGGERS)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only close() touches a connection from another thread
+            conn = sqlite3.connect(self.path, cached_statements=256, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        _close_all(self._connections, self._connections_lock)
+        self._local = threading.local()
+
+    def touch_patient(self, user_id: str) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(_BUMP_PATIENT.format(user_id="?"), (user_id,))
+
+    def patient_version(self, user_id: str) -> int:
+        row = self._connection().execute(_SELECT_PATIENT_VERSION, (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def touch_catalog(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(_BUMP_CATALOG)
+
+    def catalog_version(self) -> Tuple[int, int, int]:
+        version = self._connection().execute(_SELECT_CATALOG_VERSION).fetchone()[0]
+        return self.generation, version, self.inventory.version
+
+    def is_empty(self) -> bool:
+        """Return True if no medications have been loaded."""
+        return self._connection().execute("SELECT 1 FROM medications LIMIT 1").fetchone() is None
+
+    def load(self,
+             users: Mapping[str, Patient],
+             medications: Mapping[str, Medication]) -> None:
+        """Replace the database contents with the given patient and medication records."""
+        conn = self._connection()
+        with conn:
+            for table in ("patients", "prescriptions", "allergies", "medications",
+                          "medication_lookup", "medication_terms"):
+                conn.execute(f"DELETE FROM {table}")
+            self.write_patients(conn, users.values())
+            self.write_medications(conn, medications)
+
+    @staticmethod
+    def write_patients(conn: sqlite3.Connection, patients: Iterable[Patient]) -> None:
+        """Insert or replace patient rows with their prescriptions and allergies."""
+        for patient in patients:
+            user_id = patient.id
+            conn.execute("INSERT OR REPLACE INTO patients VALUES (?, ?, ?, ?)",
+                         (user_id, patient.name, patient.name_hebrew, patient.history))
+            conn.execute("DELETE FROM prescriptions WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM allergies WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO prescriptions VALUES (?, ?, ?, ?)",
+                [(user_id, i, rx.name, rx.instructions) for i, rx in enumerate(patient.prescriptions)]
+            )
+            conn.executemany(
+                "INSERT INTO allergies VALUES (?, ?, ?)",
+                [(user_id, i, allergy) for i, allergy in enumerate(patient.allergies)]
+            )
+
+    @staticmethod
+    def write_medications(conn: sqlite3.Connection,
+                          medications: Mapping[str, Medication]) -> None:
+        """Insert medication rows plus their lookup keys and indexed terms."""
+        index = MedicationIndex(medications)
+        conn.executemany(
+            "INSERT OR REPLACE INTO medications VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(med_key, index.position(med_key), med.sku, med.name, med.name_hebrew,
+              med.drug_class, med.active_ingredients, int(med.requires_rx), med.stock_level,
+              med.restrictions)
+             for med_key, med in medications.items()]
+        )
+        conn.executemany("INSERT OR REPLACE INTO medication_lookup VALUES (?, ?)",
+                         list(index.name_keys()))
+        terms = []
+        for med_key in medications:
+            traits = index.traits(med_key)
+            terms.extend((TERM_INGREDIENT, i, med_key) for i in traits.ingredients)
+            if traits.drug_class:
+                terms.append((TERM_CLASS, traits.drug_class, med_key))
+            terms.extend((TERM_CONFLICT, c, med_key) for c in traits.conflict_ids)
+        conn.executemany("INSERT OR REPLACE INTO medication_terms VALUES (?, ?, ?)", terms)
+
+    def get_patient(self, user_id: str) -> Optional[Patient]:
+        conn = self._connection()
+        row = conn.execute(_SELECT_PATIENT, (user_id,)).fetchone()
+        if row is None:
+            return None
+        return make_patient(
+            row[0],
+            row[1],
+            row[2],
+            [a for (a,) in conn.execute(_SELECT_ALLERGIES, (user_id,))],
+            conn.execute(_SELECT_PRESCRIPTIONS, (user_id,)).fetchall(),
+            row[3],
+        )
+
+    def _write_patient(self, patient: Patient) -> None:
+        conn = self._connection()
+        with conn:
+            self.write_patients(conn, [patient])
+
+    def patient_exists(self, user_id: str) -> bool:
+        return self._connection().execute(_SELECT_PATIENT_EXISTS, (user_id,)).fetchone() is not None
+
+    def find_medication(self, name: str) -> Tuple[Optional[str], Optional[Medication]]:
+        row = self._connection().execute(_SELECT_MEDICATION_BY_LOOKUP,
+                                         (normalize_name(name),)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], make_medication(*row[1:])
+
+    def medication_traits(self, med_key: str) -> MedicationTraits:
+        ingredients, conflict_ids, drug_class = set(), set(), ""
+        for kind, term in self._connection().execute(_SELECT_TERMS, (med_key,)):
+            if kind == TERM_INGREDIENT:
+                ingredients.add(term)
+            elif kind == TERM_CLASS:
+                drug_class = term
+            else:
+                conflict_ids.add(term)
+        return MedicationTraits(frozenset(ingredients), drug_class, frozenset(conflict_ids))
+
+    def medication_names(self) -> Iterable[Tuple[str, str]]:
+        for med_key, name, name_hebrew in self._connection().execute(_SELECT_NAMES):
+            yield name, med_key
+            if name_hebrew:
+                yield name_hebrew, med_key
+
+    def find_alternatives(
+            self,
+            active_ingredient: str,
+            exclude_med_key: Optional[str] = None,
+            exclude_drug_classes: Iterable[str] = ()
+    ) -> List[str]:
+        ingredients = sorted(parse_ingredients(active_ingredient))
+        if not ingredients:
+            return []
+        classes = sorted({normalize_name(c) for c in exclude_drug_classes})
+
+        # One indexed subquery per ingredient; statement text only varies with
+        # the number of ingredients/classes so the cache stays small
+        match_sql = " INTERSECT ".join(
+            "SELECT med_key FROM medication_terms WHERE kind = 'ingredient' AND term = ?"
+            for _ in ingredients
+        )
+        sql = f"SELECT name FROM medications WHERE med_key IN ({match_sql}) AND med_key != ?"
+        if classes:
+            placeholders = ", ".join("?" for _ in classes)
+            sql += (" AND med_key NOT IN (SELECT med_key FROM medication_terms "
+                    f"WHERE kind = 'class' AND term IN ({placeholders}))")
+        sql += " ORDER BY position"
+
+        params = [*ingredients, exclude_med_key or "", *classes]
+        return [name for (name,) in self._connection().execute(sql, params)]
+
+
+def create_repository(backend: Optional[str] = None,
+                      path: Optional[str] = None,
+                      users: Optional[Mapping[str, Mapping]] = None,
+                      medications: Optional[Mapping[str, Mapping]] = None) -> Repository:
+    """
+    Build a repository for the configured backend.
+
+    Args:
+        backend: "memory" or "sqlite" (defaults to PHARMACY_DB_BACKEND)
+        path: SQLite database file (defaults to PHARMACY_DB_PATH)
+        users: USERS_DB-style source data (defaults to app/database.py)
+        medications: MEDICATIONS_DB-style source data (defaults to app/database.py)
+
+    Fallback Behavior:
+        - An empty SQLite database is seeded from the source data
+        - The memory backend reads medications from the catalog file at
+          PHARMACY_CATALOG_PATH when set
+    """
+    backend = (backend or os.getenv("PHARMACY_DB_BACKEND", DEFAULT_BACKEND)).lower()
+    users = USERS_DB if users is None else users
+    medications = MEDICATIONS_DB if medications is None else medications
+
+    if backend == "memory":
+        catalog_path = os.getenv("PHARMACY_CATALOG_PATH")
+        if catalog_path:
+            logger.info(f"Opening mmap catalog at {catalog_path}")
+            return InMemoryRepository(load_patients(users), MappedCatalog(catalog_path))
+        return InMemoryRepository(load_patients(users), load_medications(medications))
+
+    if backend == "sqlite":
+        repository = SqliteRepository(path or os.getenv("PHARMACY_DB_PATH", DEFAULT_SQLITE_PATH))
+        if repository.is_empty():
+            logger.info(f"Seeding empty SQLite database at {repository.path}")
+            repository.load(load_patients(users), load_medications(medications))
+        return repository
+
+    raise ValueError(f"Unknown repository backend: {backend}")
+
+
+_repository: Optional[Repository] = None
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> Repository:
+    """Return the process-wide repository, creating it on first use."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = create_repository()
+                logger.info(f"Using {type(_repository).__name__}")
+    return _repository
+
+
+def set_repository(repository: Repository) -> None:
+    """
+    Replace the process-wide repository.
+    Callers that already hold the previous repository keep using it.
+    """
+    global _repository
+    with _repository_lock:
+        _repository = repository
@@ -0,0 +1,124 @@
+"""
+Per-session turn serialization.
+
+A chat turn reads the session history, streams while appending to it, and
+stores the new messages at the end. Two turns on the same session at once
+(a double submit, or the shared "default" session) would interleave their
+messages and break tool-call ordering, so each turn holds its session's
+lock for its whole duration. Waiters queue in arrival order; a turn that
+can't get the lock within the timeout, or arrives when too many turns are
+already queued, is rejected. Different sessions never wait on each other.
+
+Locks are asyncio locks, so turns are serialized within one server
+process; entries are created on demand and dropped when unused.
+"""
+
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_MAX_WAITING = 4
+
+
+class SessionBusy(Exception):
+    """The session is busy with other turns; the message is shown to the user."""
+
+
+class _SessionLock:
+    __slots__ = ("lock", "users", "waiting")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0      # holder plus waiters
+        self.waiting = 0
+
+
+class SessionLocks:
+    """
+    Registry of per-session locks with wait metrics.
+
+    Args:
+        timeout: Seconds a turn may wait for its session
+        max_waiting: Turns allowed to queue behind the running one
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT_SECONDS, max_waiting: int = DEFAULT_MAX_WAITING):
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self._locks: Dict[str, _SessionLock] = {}
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[float]:
+        """
+        Hold a session's lock for the duration of the block.
+
+        Yields:
+            Seconds spent waiting for the lock
+
+        Raises:
+            SessionBusy: The queue is full or the wait timed out
+        """
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = _SessionLock()
+        if entry.lock.locked() and entry.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise SessionBusy("Too many messages are waiting in this conversation. Please wait for the answer.")
+
+        entry.users += 1
+        try:
+            began = time.perf_counter()
+            if entry.lock.locked():
+                self.contended += 1
+            entry.waiting += 1
+            self.max_queue_depth = max(self.max_queue_depth, entry.waiting)
+            try:
+                async with asyncio.timeout(self.timeout):
+                    await entry.lock.acquire()
+            except TimeoutError:
+                self.timeouts += 1
+                logger.warning(f"Session {session_id} turn timed out waiting for the previous turn")
+                raise SessionBusy("The previous message in this conversation is still being answered. "
+                                  "Please try again.") from None
+            finally:
+                entry.waiting -= 1
+
+            waited = time.perf_counter() - began
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if waited > 0.001:
+                logger.info(f"Session {session_id} turn waited {waited * 1000:.0f}ms for the previous turn")
+            try:
+                yield waited
+            finally:
+                entry.lock.release()
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[session_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "locked_sessions": sum(1 for entry in self._locks.values() if entry.lock.locked()),
+            "waiting_turns": sum(entry.waiting for entry in self._locks.values()),
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 2) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
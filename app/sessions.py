@@ -0,0 +1,390 @@
+"""
+Chat session storage.
+
+Backends:
+- memory (default): sessions in an OrderedDict in least-recently-used
+  order. Every access moves the session to the end, so eviction pops from
+  the front in O(1) and an active conversation is never dropped ahead of
+  an idle one. A global byte budget (tracked incrementally from message
+  sizes) bounds total memory.
+- sqlite: append-only message rows in a WAL-mode database shared by every
+  uvicorn worker on the host, so any worker can serve any conversation.
+
+Callers get a copy of a session's history, append the turn's messages to
+it, and hand back only the new ones with append(). Idle sessions are
+expired by a background sweeper. A store with blocking_io set waits on
+disk and other processes' locks, so callers run its methods on the tool
+thread pool rather than the event loop.
+
+Select with SESSION_BACKEND=memory|sqlite and SESSION_DB_PATH.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.tool_exec import run_blocking
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "memory"
+DEFAULT_SQLITE_PATH = "sessions.db"
+DEFAULT_MAX_SESSIONS = 100
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SWEEP_INTERVAL = 60.0
+
+Message = Dict[str, Any]
+
+
+def message_size(message: Message) -> int:
+    """Approximate memory footprint of a message (its UTF-8 JSON size)."""
+    return len(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+class SessionStore(ABC):
+    """
+    Interface for chat history storage.
+
+    Sessions idle longer than ttl_seconds expire, and the least recently
+    used sessions are evicted beyond max_sessions or max_bytes.
+    """
+
+    # True if calls block on I/O, so they should not run on the event loop
+    blocking_io = False
+
+    def __init__(self,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_sessions: Maximum number of sessions kept
+            ttl_seconds: Idle time after which a session expires
+            max_bytes: Budget for the summed message sizes of all sessions
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self.expired = 0
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[List[Message]]:
+        """Return a copy of a session's messages and mark it as used, or None."""
+
+    @abstractmethod
+    def create(self, session_id: str, messages: List[Message]) -> None:
+        """Store a new session, replacing any existing one."""
+
+    def replace(self, session_id: str, messages: List[Message]) -> None:
+        """Rewrite a session's whole history (e.g. after trimming)."""
+        self.create(session_id, messages)
+
+    @abstractmethod
+    def append(self, session_id: str, messages: List[Message]) -> None:
+        """Append new messages to a session's history."""
+
+    @abstractmethod
+    def session_ids(self) -> List[str]:
+        """Session IDs from least to most recently used."""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Expire idle sessions and enforce limits; return the number removed."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+
+    def close(self) -> None:
+        """Release any resources held by the store."""
+
+
+class _Session:
+    __slots__ = ("messages", "nbytes", "last_access")
+
+    def __init__(self):
+        self.messages: List[Message] = []
+        self.nbytes = 0
+        self.last_access = time.monotonic()
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    In-process LRU session store.
+
+    Mostly used from the event loop, but sessions start on tool pool threads
+    when the repository blocks on I/O, so every method holds _lock.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def get(self, session_id: str) -> Optional[List[Message]]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self._is_expired(session, time.monotonic()):
+                self._remove(session_id)
+                self.expired += 1
+                return None
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return list(session.messages)
+
+    def create(self, session_id: str, messages: List[Message]) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            self._sessions[session_id] = _Session()
+            self._append(session_id, messages)
+
+    def append(self, session_id: str, messages: List[Message]) -> None:
+        """Append messages and evict least recently used sessions while over budget."""
+        with self._lock:
+            self._append(session_id, messages)
+
+    def _append(self, session_id: str, messages: List[Message]) -> None:
+        session = self._sessions.get(session_id)
+        if session is None:
+            # Evicted while a response was streaming; nothing to store
+            return
+        added = sum(message_size(m) for m in messages)
+        session.messages.extend(messages)
+        session.nbytes += added
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        self.total_bytes += added
+        self._enforce_limits()
+
+    def _is_expired(self, session: _Session, now: float) -> bool:
+        return now - session.last_access > self.ttl_seconds
+
+    def _remove(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session.nbytes
+
+    def _enforce_limits(self) -> None:
+        # Keep the most recent session even if it alone exceeds the budget
+        while len(self._sessions) > 1 and (
+                len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+            session_id, session = self._sessions.popitem(last=False)
+            self.total_bytes -= session.nbytes
+            self.evicted += 1
+            logger.info(f"Evicted least recently used session: {session_id}")
+
+    def sweep(self) -> int:
+        """
+        Expire idle sessions. Sessions are in access order, so the scan
+        stops at the first one still within its TTL.
+        """
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            while self._sessions:
+                session_id, session = next(iter(self._sessions.items()))
+                if not self._is_expired(session, now):
+                    break
+                self._remove(session_id)
+                removed += 1
+        if removed:
+            self.expired += removed
+            logger.info(f"Expired {removed} idle sessions")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+
+_SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL,
+    nbytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions (last_access);
+CREATE TABLE IF NOT EXISTS session_messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_messages_session ON session_messages (session_id, id);
+"""
+
+# Fixed SQL text so prepared statements are reused from the statement cache
+_SELECT_SESSION_MESSAGES = "SELECT message FROM session_messages WHERE session_id = ? ORDER BY id"
+_SELECT_LIVE_SESSION = "SELECT 1 FROM sessions WHERE session_id = ? AND last_access >= ?"
+_UPSERT_SESSION = (
+    "INSERT INTO sessions VALUES (?, ?, 0) "
+    "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access, nbytes = 0"
+)
+_DELETE_SESSION_MESSAGES = "DELETE FROM session_messages WHERE session_id = ?"
+_INSERT_SESSION_MESSAGE = "INSERT INTO session_messages (session_id, message) VALUES (?, ?)"
+_GROW_SESSION = "UPDATE sessions SET last_access = ?, nbytes = nbytes + ? WHERE session_id = ?"
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Session store shared by several worker processes through one SQLite file.
+
+    History is kept as append-only message rows, so a turn writes only its
+    new messages. WAL mode lets workers read concurrently while one writes.
+    Limits are enforced by the sweeper rather than on every append. Writes
+    can wait up to 5s for another worker's write lock, so calls run on
+    the tool thread pool; a lock keeps them from sharing the connection.
+    """
+
+    blocking_io = True
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, cached_statements=64, timeout=5.0,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SESSION_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, session_id: str) -> Optional[List[Message]]:
+        # Read-only: last_access is bumped when the turn's messages are appended,
+        # so each turn costs one read and one write transaction.
+        # A session past its TTL reads as missing even before the sweeper runs.
+        with self._lock:
+            if self._conn.execute(_SELECT_LIVE_SESSION,
+                                  (session_id, time.time() - self.ttl_seconds)).fetchone() is None:
+                return None
+            return [json.loads(m) for (m,) in self._conn.execute(_SELECT_SESSION_MESSAGES, (session_id,))]
+
+    def create(self, session_id: str, messages: List[Message]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(_UPSERT_SESSION, (session_id, time.time()))
+            self._conn.execute(_DELETE_SESSION_MESSAGES, (session_id,))
+            self._insert(session_id, messages)
+
+    def append(self, session_id: str, messages: List[Message]) -> None:
+        if not messages:
+            return
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._insert(session_id, messages)
+
+    def _insert(self, session_id: str, messages: List[Message]) -> None:
+        rows = [(session_id, json.dumps(m, ensure_ascii=False)) for m in messages]
+        # A session expired or evicted mid-turn is gone; its late messages are dropped
+        if self._conn.execute(_GROW_SESSION, (time.time(), sum(len(r[1].encode("utf-8")) for r in rows),
+                                              session_id)).rowcount:
+            self._conn.executemany(_INSERT_SESSION_MESSAGE, rows)
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return [s for (s,) in self._conn.execute("SELECT session_id FROM sessions ORDER BY last_access")]
+
+    def sweep(self) -> int:
+        """Expire idle sessions, then evict least recently used ones beyond the limits."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            expired = self._conn.execute("DELETE FROM sessions WHERE last_access < ?",
+                                         (time.time() - self.ttl_seconds,)).rowcount
+            count, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM sessions").fetchone()
+            evicted = 0
+            for session_id, nbytes in self._conn.execute(
+                    "SELECT session_id, nbytes FROM sessions ORDER BY last_access").fetchall():
+                remaining = count - evicted
+                # Keep the most recent session even if it alone exceeds the budget
+                if remaining <= 1 or (remaining <= self.max_sessions and total_bytes <= self.max_bytes):
+                    break
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                total_bytes -= nbytes
+                evicted += 1
+        self.expired += expired
+        self.evicted += evicted
+        if expired or evicted:
+            logger.info(f"Session sweep expired {expired} and evicted {evicted} sessions")
+        return expired + evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total_bytes, messages = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0), "
+                "(SELECT COUNT(*) FROM session_messages) FROM sessions").fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": count,
+            "messages": messages,
+            "max_sessions": self.max_sessions,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+
+def create_session_store(backend: Optional[str] = None,
+                         path: Optional[str] = None,
+                         **limits) -> SessionStore:
+    """
+    Build a session store for the configured backend.
+
+    Args:
+        backend: "memory" or "sqlite" (defaults to SESSION_BACKEND)
+        path: SQLite database file (defaults to SESSION_DB_PATH)
+        limits: max_sessions, ttl_seconds and max_bytes
+    """
+    backend = (backend or os.getenv("SESSION_BACKEND", DEFAULT_BACKEND)).lower()
+    if backend == "memory":
+        return InMemorySessionStore(**limits)
+    if backend == "sqlite":
+        return SqliteSessionStore(path or os.getenv("SESSION_DB_PATH", DEFAULT_SQLITE_PATH), **limits)
+    raise ValueError(f"Unknown session backend: {backend}")
+
+
+async def run_sweeper(store: SessionStore, interval: float = DEFAULT_SWEEP_INTERVAL) -> None:
+    """Periodically expire idle sessions until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if store.blocking_io:
+                await run_blocking(store.sweep)
+            else:
+                store.sweep()
+        except Exception as e:
+            logger.error(f"Session sweep failed: {str(e)}", exc_info=True)
@@ -0,0 +1,120 @@
+"""
+Hot reload of patient and catalog data without restarting the server.
+
+A reload builds a complete new repository (records plus indexes) in a
+worker thread while requests keep using the current one, then swaps it
+in with set_repository(). Tools fetch the repository once per call, so
+in-flight calls finish against the snapshot they started with; the old
+snapshot is freed when the last of them drops its reference. Chat
+sessions are untouched.
+
+For the memory backend the source data is re-read from app/database.py
+(and the mmap catalog is reopened if PHARMACY_CATALOG_PATH is set), and
+the new snapshot takes over the live stock levels of medications still in
+the catalog; the rest restart from the catalog. The SQLite backend already
+reads live rows, so a reload just starts a fresh repository generation;
+the previous repository's per-thread connections are closed as soon as
+the last in-flight call releases it.
+"""
+
+import importlib
+import os
+import threading
+import time
+import weakref
+import logging
+from typing import Any, Dict, Optional
+
+from app.repository import (
+    InMemoryRepository,
+    Repository,
+    create_repository,
+    get_repository,
+    set_repository,
+)
+
+logger = logging.getLogger(__name__)
+
+_reload_lock = threading.Lock()
+_last_report: Optional[Dict[str, Any]] = None
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def build_snapshot() -> Repository:
+    """Build a new repository from freshly loaded source data."""
+    import app.database
+    database = importlib.reload(app.database)
+    return create_repository(users=database.USERS_DB, medications=database.MEDICATIONS_DB)
+
+
+def _record_release(report: Dict[str, Any], swapped_at: float) -> None:
+    report["old_snapshot_released_after_seconds"] = round(time.perf_counter() - swapped_at, 3)
+    logger.info(f"Previous snapshot (generation {report['previous_generation']}) released "
+                f"{report['old_snapshot_released_after_seconds']}s after swap")
+
+
+def reload_snapshot() -> Dict[str, Any]:
+    """
+    Build a new snapshot and swap it in.
+
+    Returns:
+        Report with build time, memory used while both snapshots were
+        alive, generations and live stock levels carried over (memory
+        backend). When the previous snapshot is freed,
+        old_snapshot_released_after_seconds is added to the report.
+
+    Error Handling:
+        - If building fails, the current snapshot stays in place and the
+          exception propagates
+        - Concurrent reloads are serialized
+    """
+    global _last_report
+    with _reload_lock:
+        previous = get_repository()
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+
+        repository = build_snapshot()
+        built = time.perf_counter()
+        rss_overlap = _rss_bytes()
+
+        # The store is shared, not copied, so changes made through either snapshot are kept
+        stock_levels_kept = None
+        if isinstance(previous, InMemoryRepository) and isinstance(repository, InMemoryRepository):
+            stock_levels_kept = repository.adopt_inventory(previous)
+        set_repository(repository)
+        swapped_at = time.perf_counter()
+
+        report: Dict[str, Any] = {
+            "backend": type(repository).__name__,
+            "previous_generation": previous.generation,
+            "generation": repository.generation,
+            "stock_levels_kept": stock_levels_kept,
+            "build_seconds": round(built - started, 4),
+            "swap_seconds": round(swapped_at - built, 6),
+            "rss_before_bytes": rss_before,
+            "rss_overlap_bytes": rss_overlap,
+            # Extra memory held while the old and new snapshots coexist
+            "overlap_bytes": rss_overlap - rss_before if rss_before is not None else None,
+            "old_snapshot_released_after_seconds": None,
+        }
+        weakref.finalize(previous, _record_release, report, swapped_at)
+        del previous
+
+        _last_report = report
+        logger.info(f"Swapped in snapshot generation {report['generation']} "
+                    f"(built in {report['build_seconds']}s, overlap {report['overlap_bytes']} bytes)")
+        return report
+
+
+def last_reload_report() -> Optional[Dict[str, Any]]:
+    """Report from the most recent reload, or None if none has run."""
+    return _last_report
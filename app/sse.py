@@ -0,0 +1,95 @@
+"""
+Server-sent event frames for chat responses.
+
+Model output arrives as many tiny deltas. SSEWriter buffers content and
+sends it as one frame once the buffer is flush_interval old or
+flush_bytes large, so the UI parses and re-renders far fewer frames. The
+first content of a response is sent at once, to keep time-to-first-byte
+low, and any other event (tool call, stats, error) first flushes
+buffered content so the order is preserved. Buffered content is also
+sent when the producer calls flush() (end of an LLM stream).
+
+Content frames skip building a dict for json.dumps, and non-ASCII text
+(Hebrew) is sent as UTF-8 rather than \\uXXXX escapes.
+
+A writer with flush_interval 0 sends one frame per delta (per-token mode).
+"""
+
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_FLUSH_INTERVAL = 0.03
+DEFAULT_FLUSH_BYTES = 256
+
+_CONTENT_PREFIX = 'data: {"content": '
+_FRAME_END = "}\n\n"
+
+
+def encode_event(payload: Dict[str, Any]) -> str:
+    """Encode one SSE data frame."""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def encode_content(text: str) -> str:
+    """Encode a content frame (same JSON as encode_event({"content": text}))."""
+    return _CONTENT_PREFIX + json.dumps(text, ensure_ascii=False) + _FRAME_END
+
+
+class SSEWriter:
+    """
+    Coalesces content deltas into SSE frames.
+
+    Args:
+        flush_interval: Seconds content may wait in the buffer (0 = per-token frames)
+        flush_bytes: Buffered UTF-8 bytes that trigger a flush
+        clock: Time source (for tests and benchmarks)
+    """
+
+    def __init__(self,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 flush_bytes: int = DEFAULT_FLUSH_BYTES,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self._clock = clock
+        self._buffer: List[str] = []
+        self._buffered_bytes = 0
+        self._buffered_since = 0.0
+        self._sent_content = False
+        self.frames = 0
+
+    def content(self, delta: str) -> Optional[str]:
+        """Add a content delta; returns a frame to send now, if any."""
+        if not delta:
+            return None
+        if self.flush_interval <= 0 or not self._sent_content:
+            self._sent_content = True
+            return self._frame(encode_content(delta))
+
+        now = self._clock()
+        if not self._buffer:
+            self._buffered_since = now
+        self._buffer.append(delta)
+        self._buffered_bytes += len(delta.encode("utf-8"))
+        if self._buffered_bytes >= self.flush_bytes or now - self._buffered_since >= self.flush_interval:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Return a frame with all buffered content, or None if there is none."""
+        if not self._buffer:
+            return None
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        return self._frame(encode_content(text))
+
+    def event(self, payload: Dict[str, Any]) -> str:
+        """Frame(s) for a non-content event, preceded by any buffered content."""
+        pending = self.flush() or ""
+        return pending + self._frame(encode_event(payload))
+
+    def _frame(self, frame: str) -> str:
+        self.frames += 1
+        return frame
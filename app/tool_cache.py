@@ -0,0 +1,144 @@
+"""
+Read-through cache for tool results.
+
+Entries are keyed by tool name plus normalized arguments and stamped with
+the repository versions the result was computed from: the catalog version
+(which includes live stock) and, for patient tools, the patient's record
+version. A lookup whose stamp no longer matches is a miss, so a stock
+change or prescription update is never served stale. Entries also expire
+after a per-tool TTL, and the least recently used entry is evicted once
+the cache is full.
+"""
+
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from app.repository import Repository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+
+# Seconds a result may be reused, even while versions are unchanged
+TOOL_TTLS: Dict[str, float] = {
+    "get_medication_info": 60.0,
+    "check_user_status": 30.0,
+    "check_user_status_batch": 30.0,
+    "get_alternatives": 300.0,
+    "get_patient_details": 60.0,
+}
+
+# Tools whose results depend only on the patient record, not the catalog
+PATIENT_ONLY_TOOLS = frozenset({"get_patient_details"})
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def cache_key(tool_name: str, args: Dict[str, Any]) -> Tuple[str, str]:
+    """Build a cache key from the tool name and its arguments as canonical JSON."""
+    return tool_name, json.dumps(_normalize(args), sort_keys=True, ensure_ascii=False)
+
+
+def data_version(repository: Repository, tool_name: str, args: Dict[str, Any]) -> Hashable:
+    """
+    Return the repository versions a tool result depends on.
+
+    Must be read before the tool runs: if data changes while it runs, the
+    stored stamp is already out of date and the entry is never served.
+    """
+    catalog = None if tool_name in PATIENT_ONLY_TOOLS else repository.catalog_version()
+    user_id = args.get("user_id")
+    patient = repository.patient_version(user_id) if isinstance(user_id, str) else None
+    return repository.generation, catalog, patient
+
+
+class _Entry(NamedTuple):
+    version: Hashable
+    expires_at: float
+    result: Dict[str, Any]
+
+
+class ToolResultCache:
+    """
+    Bounded LRU cache of tool results with per-tool TTLs and version stamps.
+
+    Used from the event loop only, so no locking is needed.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttls: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            max_entries: Maximum number of cached results
+            ttls: Tool name -> TTL in seconds; tools without a TTL are not cached
+        """
+        self.max_entries = max_entries
+        self.ttls = TOOL_TTLS if ttls is None else ttls
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def cacheable(self, tool_name: str) -> bool:
+        return self.max_entries > 0 and self.ttls.get(tool_name, 0) > 0
+
+    def get(self, key: Tuple[str, str], version: Hashable) -> Optional[Dict[str, Any]]:
+        """Return the cached result, or None if missing, expired or stale."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.version != version:
+            del self._entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.result
+
+    def put(self, key: Tuple[str, str], version: Hashable, result: Dict[str, Any]) -> None:
+        """Store a result computed against the given version."""
+        ttl = self.ttls.get(key[0], 0)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = _Entry(version, time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for tuning size and TTLs."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale": self.stale,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,125 @@
+"""
+Execution policies for tool calls.
+
+- inline: call the function on the event loop (in-memory lookups that
+  take microseconds, where a thread hop costs more than the call)
+- thread: run it on a dedicated bounded thread pool (backends that block
+  on I/O, such as SQLite)
+- async: await the tool's async variant
+
+By default a tool runs inline unless the current repository blocks on
+I/O, in which case it goes to the thread pool. TOOL_POLICIES overrides
+the policy per tool, e.g. "get_alternatives=thread,check_user_status=async".
+"""
+
+import os
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from app.repository import get_repository
+
+logger = logging.getLogger(__name__)
+
+POLICY_INLINE = "inline"
+POLICY_THREAD = "thread"
+POLICY_ASYNC = "async"
+POLICIES = (POLICY_INLINE, POLICY_THREAD, POLICY_ASYNC)
+
+TOOL_THREAD_POOL_SIZE = int(os.getenv("TOOL_THREAD_POOL_SIZE", "8"))
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=TOOL_THREAD_POOL_SIZE, thread_name_prefix="tool")
+    return _pool
+
+
+async def run_blocking(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking function on the tool thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), functools.partial(function, *args, **kwargs))
+
+
+async def run_repository_io(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call a function that reads the repository: on the tool thread pool
+    when the repository blocks on I/O, directly otherwise. Coroutines on
+    the event loop use this for every repository read outside a tool.
+    """
+    if get_repository().blocking_io:
+        return await run_blocking(function, *args, **kwargs)
+    return function(*args, **kwargs)
+
+
+def shutdown_pool() -> None:
+    """Stop the tool thread pool (a new one is created on next use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def parse_policies(spec: str) -> Dict[str, str]:
+    """
+    Parse "tool=policy,tool=policy" into a mapping.
+
+    Raises:
+        ValueError: On a malformed entry or unknown policy
+    """
+    policies = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        tool, sep, policy = entry.partition("=")
+        policy = policy.strip().lower()
+        if not sep or policy not in POLICIES:
+            raise ValueError(f"Invalid tool policy {entry!r} (expected tool={'|'.join(POLICIES)})")
+        policies[tool.strip()] = policy
+    return policies
+
+
+class ToolRunner:
+    """Runs tools by name under their execution policy."""
+
+    def __init__(self,
+                 tools: Mapping[str, Callable[..., Dict[str, Any]]],
+                 async_tools: Optional[Mapping[str, Callable[..., Awaitable[Dict[str, Any]]]]] = None,
+                 policies: Optional[Mapping[str, str]] = None):
+        self.tools = dict(tools)
+        self.async_tools = dict(async_tools or {})
+        self.policies = dict(policies or {})
+        for tool, policy in self.policies.items():
+            if policy == POLICY_ASYNC and tool not in self.async_tools:
+                raise ValueError(f"Tool {tool} has no async variant")
+
+    def policy_for(self, tool_name: str) -> str:
+        """Policy a tool runs under right now."""
+        policy = self.policies.get(tool_name)
+        if policy is not None:
+            return policy
+        return POLICY_THREAD if get_repository().blocking_io else POLICY_INLINE
+
+    async def run(self, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a tool.
+
+        Raises:
+            KeyError: If the tool is unknown
+            Exception: Whatever the tool raises
+        """
+        policy = self.policy_for(tool_name)
+        if policy == POLICY_ASYNC:
+            return await self.async_tools[tool_name](**args)
+        tool = self.tools[tool_name]
+        if policy == POLICY_THREAD:
+            return await run_blocking(tool, **args)
+        return tool(**args)
@@ -62,11 +62,34 @@ TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "check_user_status_batch",
+            "description": "Run check_user_status for several medications at once for the same patient. Returns results keyed by each requested medication name. Use this instead of repeated check_user_status calls when checking all of a patient's prescriptions or all suggested alternatives.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {
+                        "type": "string",
+                        "description": "9-digit patient identifier"
+                    },
+                    "med_names": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Medication names to check (e.g., ['Lisinopril', 'Metformin'])"
+                    }
+                },
+                "required": ["user_id", "med_names"],
+                "additionalProperties": False
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
             "name": "get_alternatives",
-            "description": "Find alternative medications with the same active ingredient. Use when patient cannot take current medication due to allergies, stock issues, or preference. IMPORTANT: After getting alternatives, call check_user_status for EACH suggested alternative to verify patient safety before recommending it.",
+            "description": "Find alternative medications with the same active ingredient. Use when patient cannot take current medication due to allergies, stock issues, or preference. IMPORTANT: After getting alternatives, call check_user_status_batch once with ALL suggested alternatives to verify patient safety before recommending them.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -0,0 +1,99 @@
+"""
+Incremental assembly of streamed tool calls.
+
+The completion stream delivers tool calls as fragments (an id and name,
+then pieces of the JSON arguments), one call after another by index. The
+assembler reports each call as soon as its arguments are complete, so
+the caller can start running it while the model is still generating the
+rest of the stream. A call is complete when the next index starts, or
+when its arguments already parse as a closed JSON object.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+
+@dataclass
+class StreamedToolCall:
+    """One tool call being assembled from stream deltas."""
+    index: int
+    id: Optional[str]
+    name: Optional[str]
+    args: str = ""
+    parsed: Optional[Dict[str, Any]] = None
+    completed_at: Optional[float] = None
+
+
+def _parse_object(text: str) -> Optional[Dict[str, Any]]:
+    if not text.rstrip().endswith("}"):
+        return None
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+class ToolCallAssembler:
+    """Collects tool call deltas and reports calls as they become complete."""
+
+    def __init__(self):
+        self.calls: List[StreamedToolCall] = []
+
+    def feed(self, deltas: Iterable[Any]) -> List[StreamedToolCall]:
+        """
+        Add the tool call deltas of one stream chunk.
+
+        Returns:
+            Calls whose arguments became complete with this chunk
+
+        Raises:
+            ValueError: If a finished call's arguments are not a JSON object
+        """
+        for delta in deltas:
+            while len(self.calls) <= delta.index:
+                self.calls.append(StreamedToolCall(len(self.calls), None, None))
+            call = self.calls[delta.index]
+            call.id = call.id or delta.id
+            function = delta.function
+            if function is not None:
+                call.name = call.name or function.name
+                if function.arguments:
+                    call.args += function.arguments
+
+        completed = []
+        now = time.perf_counter()
+        for call in self.calls:
+            if call.completed_at is not None:
+                continue
+            # Arguments of a call are final once a later call has started
+            if call.index + 1 < len(self.calls):
+                completed.append(self._complete(call, now))
+            else:
+                parsed = _parse_object(call.args)
+                if parsed is not None:
+                    completed.append(self._complete(call, now, parsed))
+        return completed
+
+    def finish(self) -> List[StreamedToolCall]:
+        """
+        Complete every remaining call at the end of the stream.
+
+        Raises:
+            ValueError: If a call's arguments are not a JSON object
+        """
+        now = time.perf_counter()
+        return [self._complete(call, now) for call in self.calls if call.completed_at is None]
+
+    @staticmethod
+    def _complete(call: StreamedToolCall, now: float,
+                  parsed: Optional[Dict[str, Any]] = None) -> StreamedToolCall:
+        if parsed is None:
+            parsed = _parse_object(call.args or "{}")
+            if parsed is None:
+                raise ValueError(f"Invalid arguments for tool call {call.name}: {call.args!r}")
+        call.parsed = parsed
+        call.completed_at = now
+        return call
@@ -4,8 +4,12 @@ Each tool provides specific functionality for medication and patient management.
 """
 
 from typing import Dict, List, Optional, Any
+import functools
 import logging
-from app.database import USERS_DB, MEDICATIONS_DB
+from app.indexes import contains_hebrew
+from app.records import Medication, Patient
+from app.repository import Repository, get_repository
+from app.tool_exec import run_repository_io
 
 logger = logging.getLogger(__name__)
 
@@ -30,17 +34,16 @@ def get_patient_details(user_id: str) -> Dict[str, Any]:
     user_id = user_id.strip()
     logger.info(f"Fetching patient details for user_id: {user_id}")
 
-    user = USERS_DB.get(user_id)
+    user = get_repository().get_patient(user_id)
     if not user:
         logger.warning(f"User not found: {user_id}")
         return {"error": "User not found."}
 
     return {
-        "name": user.get("name", "Unknown"),
-        "history": user.get("history", "No medical history available."),
-        "current_prescriptions": [p["name"] for p in
-                                  user.get("prescriptions", [])],
-        "allergies": user.get("allergies", [])
+        "name": user.name,
+        "history": user.history or "No medical history available.",
+        "current_prescriptions": [p.name for p in user.prescriptions],
+        "allergies": list(user.allergies)
     }
 
 
@@ -50,7 +53,7 @@ def get_medication_info(name: str) -> Dict[str, Any]:
 
 
     Args:
-        name: Medication name (English or Hebrew, case-insensitive for English)
+        name: Medication name (English or Hebrew) or SKU
 
 
     Returns:
@@ -60,33 +63,28 @@ def get_medication_info(name: str) -> Dict[str, Any]:
 
 
     Error Handling:
-        - Medication not found: Returns {"error": "Medication not found."}
+        - Medication not found: Returns {"error": "Medication not found."}, plus
+          "did_you_mean" with the closest catalog names when there are any
 
 
     Fallback Behavior:
-        - Case-insensitive matching via capitalization for English names
-        - Exact match for Hebrew names
+        - Case-insensitive matching for English names and SKUs
+        - Hebrew names match regardless of niqqud and final-letter forms
     """
     name = name.strip()
     logger.info(f"Fetching medication info for: {name}")
 
-    # Try English name (case-insensitive matching)
-    # capitalize() handles all caps ("IBUPROFEN" -> "Ibuprofen") and mixed case ("iBuProFen" -> "Ibuprofen")
-    name_capitalized = name.capitalize()
-    med = MEDICATIONS_DB.get(name_capitalized)
-    
+    # Single indexed lookup over English names, Hebrew names and SKUs
+    repository = get_repository()
+    med_key, med = repository.find_medication(name)
+
     if med:
-        return med
-    
-    # Try Hebrew name (exact match with normalization)
-    for med_key, med_data in MEDICATIONS_DB.items():
-        if med_data.get("name_hebrew", "").strip() == name:
-            logger.info(f"Found medication by Hebrew name: {name} -> {med_key}")
-            return med_data
-    
+        # Live stock from the inventory store overrides the catalog snapshot
+        return {**med.to_dict(), "stock_level": repository.inventory.level(med_key, med.stock_level)}
+
     # Not found
     logger.warning(f"Medication not found: {name}")
-    return {"error": "Medication not found."}
+    return _not_found(repository, "Medication not found.", name)
 
 
 
@@ -99,7 +97,7 @@ def check_user_status(user_id: str, med_name: str) -> Dict[str, Any]:
 
     Args:
         user_id: Patient identifier (9-digit string)
-        med_name: Medication name (English or Hebrew, case-insensitive for English)
+        med_name: Medication name (English or Hebrew) or SKU
 
     Returns:
         Dictionary containing:
@@ -114,81 +112,131 @@ def check_user_status(user_id: str, med_name: str) -> Dict[str, Any]:
 
     Error Handling:
         - Invalid user_id: Returns {"error": "Patient ID {id} not found."}
-        - Invalid med_name: Returns {"error": "Medication '{name}' not found."}
+        - Invalid med_name: Returns {"error": "Medication '{name}' not found."}, plus
+          "did_you_mean" with the closest catalog names when there are any
 
     Fallback Behavior:
         - If no prescription exists but medication doesn't require Rx: authorized=True
         - If allergy detected: Sets usage_instructions to "DO NOT USE"
-        - Case-insensitive matching via capitalization for English names
-        - Exact match for Hebrew names
+        - Case-insensitive matching for English names and SKUs
+        - Hebrew names match regardless of niqqud and final-letter forms
     """
     user_id = user_id.strip()
-    med_name_original = med_name.strip()
-    logger.info(f"Checking user status: user_id={user_id}, med_name={med_name_original}")
+    logger.info(f"Checking user status: user_id={user_id}, med_name={med_name.strip()}")
+
+    repository = get_repository()
+    user = repository.get_patient(user_id)
 
-    user = USERS_DB.get(user_id)
-    
     if not user:
         logger.error(f"Patient not found: {user_id}")
         return {"error": f"Patient ID {user_id} not found."}
 
-    # Try to find medication by English name (case-insensitive)
-    med_name_capitalized = med_name_original.capitalize()
-    med = MEDICATIONS_DB.get(med_name_capitalized)
-    med_key = med_name_capitalized
-    
-    # If not found, try Hebrew name (with normalization)
-    if not med:
-        for key, med_data in MEDICATIONS_DB.items():
-            if med_data.get("name_hebrew", "").strip() == med_name_original:
-                logger.info(f"Found medication by Hebrew name: {med_name_original} -> {key}")
-                med = med_data
-                med_key = key
-                break
-    
-    if not med:
-        logger.error(f"Medication not found: {med_name_original}")
-        return {"error": f"Medication '{med_name_original}' not found."}
+    return _medication_statuses(repository, user, [med_name])[med_name]
 
-    # Check prescription authorization (prescriptions use English names)
-    rx_entry = next(
-        (rx for rx in user.get("prescriptions", []) if rx["name"] == med_key),
-        None
+
+def check_user_status_batch(user_id: str, med_names: List[str]) -> Dict[str, Any]:
+    """
+    Run check_user_status for several medications in one call.
+
+    The patient record and compiled allergy set are resolved once and every
+    medication is evaluated against them, so prescription reviews and
+    alternative checks need one tool call instead of one per medication.
+
+    Args:
+        user_id: Patient identifier (9-digit string)
+        med_names: Medication names to check (English or Hebrew) or SKUs
+
+    Returns:
+        Dictionary with "results" mapping each requested name (as given) to
+        the same dictionary check_user_status returns for it.
+
+    Error Handling:
+        - Invalid user_id: Returns {"error": "Patient ID {id} not found."}
+        - Invalid med_name: That entry is {"error": "Medication '{name}' not found."}
+
+    Fallback Behavior:
+        - Duplicate names are evaluated once
+        - Stock levels across the batch are read as one consistent snapshot
+    """
+    user_id = user_id.strip()
+    logger.info(f"Checking user status batch: user_id={user_id}, med_names={med_names}")
+
+    repository = get_repository()
+    user = repository.get_patient(user_id)
+
+    if not user:
+        logger.error(f"Patient not found: {user_id}")
+        return {"error": f"Patient ID {user_id} not found."}
+
+    return {"results": _medication_statuses(repository, user, med_names)}
+
+
+def _medication_statuses(
+        repository: Repository,
+        user: Patient,
+        med_names: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """Evaluate several medications for one patient, keyed by requested name."""
+    # Resolve English name, Hebrew name or SKU through the shared index
+    resolved = {}
+    for med_name in med_names:
+        if med_name not in resolved:
+            resolved[med_name] = repository.find_medication(med_name.strip())
+
+    # One consistent stock snapshot for every medication in the request
+    stock_levels = repository.inventory.levels(
+        {med_key: med.stock_level for med_key, med in resolved.values() if med}
     )
-    is_authorized = rx_entry is not None or not med.get("requires_rx", True)
 
-    # Check for allergy conflicts
-    user_allergies = [a.lower() for a in user.get("allergies", [])]
-    drug_class = med.get("drug_class", "").lower()
-    active_ingredients = med.get("active_ingredients", "").lower()
+    results = {}
+    for med_name, (med_key, med) in resolved.items():
+        med_name_original = med_name.strip()
+        if not med:
+            logger.error(f"Medication not found: {med_name_original}")
+            results[med_name] = _not_found(repository, f"Medication '{med_name_original}' not found.",
+                                           med_name_original)
+        else:
+            results[med_name] = _medication_status(repository, user, med_name_original,
+                                                   med_key, med, stock_levels[med_key])
+    return results
+
+
+def _medication_status(
+        repository: Repository,
+        user: Patient,
+        med_name_original: str,
+        med_key: str,
+        med: Medication,
+        stock_level: int
+) -> Dict[str, Any]:
+    """Evaluate prescription, allergy and stock status of one resolved medication."""
+
+    # Check prescription authorization (prescriptions use English names)
+    rx_entry = user.prescription_for(med_key)
+    is_authorized = rx_entry is not None or not med.requires_rx
 
-    allergy_conflict = None
-    if drug_class in user_allergies:
-        allergy_conflict = f"Patient is allergic to {med['drug_class']}."
+    # Check for allergy conflicts (compiled per patient, one set intersection)
+    allergy_conflict = repository.allergy_conflict(user, med_key, med)
+    if allergy_conflict:
         logger.warning(f"Allergy conflict detected: {allergy_conflict}")
-    else:
-        for allergy in user_allergies:
-            if allergy in active_ingredients:
-                allergy_conflict = f"Patient is allergic to active ingredient {allergy}."
-                logger.warning(f"Allergy conflict detected: {allergy_conflict}")
-                break
 
     # Determine which name to return based on input language
-    med_name_to_return = med_name_original if med_name_original == med.get("name_hebrew") else med_key
+    med_name_hebrew = med.name_hebrew or med_key
+    med_name_to_return = med_name_hebrew if contains_hebrew(med_name_original) else med_key
 
     result = {
-        "user_name": user["name"],
-        "user_name_hebrew": user.get("name_hebrew", user["name"]),
+        "user_name": user.name,
+        "user_name_hebrew": user.name_hebrew,
         "medication": med_name_to_return,  # Return name in the language requested
-        "medication_name_hebrew": med.get("name_hebrew", med_key),  # Always include Hebrew name
+        "medication_name_hebrew": med_name_hebrew,  # Always include Hebrew name
         "authorized_by_rx": is_authorized,
         "has_prescription": rx_entry is not None,  # Whether user has a prescription on file
-        "requires_prescription": med.get("requires_rx", True),  # Whether medication needs Rx
-        "patient_usage_instructions": rx_entry["instructions"] if rx_entry else "No specific prescription found.",
-        "medication_restrictions": med.get("restrictions", "None listed."),
+        "requires_prescription": med.requires_rx,  # Whether medication needs Rx
+        "patient_usage_instructions": rx_entry.instructions if rx_entry else "No specific prescription found.",
+        "medication_restrictions": med.restrictions or "None listed.",
         "allergy_conflict": allergy_conflict,
-        "stock_available": med.get("stock_level", 0),
-        "active_ingredients": med.get("active_ingredients", "Unknown")
+        "stock_available": stock_level,
+        "active_ingredients": med.active_ingredients or "Unknown"
     }
 
     if allergy_conflict:
@@ -199,6 +247,16 @@ def check_user_status(user_id: str, med_name: str) -> Dict[str, Any]:
 
 
 
+def _not_found(repository: Repository, error: str, name: str) -> Dict[str, Any]:
+    """Build a not-found error with ranked spelling suggestions from the catalog."""
+    result = {"error": error}
+    suggestions = repository.suggest_medications(name)
+    if suggestions:
+        logger.info(f"Suggestions for '{name}': {suggestions}")
+        result["did_you_mean"] = suggestions
+    return result
+
+
 def get_alternatives(
         active_ingredient: str,
         current_med_name: str = "",
@@ -220,22 +278,17 @@ def get_alternatives(
         - No alternatives found: Returns {"error": "No alternatives found..."}
 
     Fallback Behavior:
-        - Case-insensitive matching
+        - Case-insensitive matching on canonical ingredients
+          (salt forms ignored, e.g. "Amoxicillin Trihydrate" matches "amoxicillin")
         - Excludes current medication from results
         - Filters out specified drug classes
     """
-    ingredient_lower = active_ingredient.strip().lower()
-    current_med_lower = current_med_name.strip().lower()
-    exclude_classes = [c.lower() for c in (exclude_drug_classes or [])]
-
     logger.info(f"Searching alternatives for ingredient: {active_ingredient}")
 
-    alternatives = [
-        m["name"] for m in MEDICATIONS_DB.values()
-        if ingredient_lower in m["active_ingredients"].lower()
-           and m["name"].lower() != current_med_lower
-           and m["drug_class"].lower() not in exclude_classes
-    ]
+    repository = get_repository()
+    current_med_key = repository.find_medication(current_med_name)[0] if current_med_name.strip() else None
+    alternatives = repository.find_alternatives(active_ingredient, current_med_key,
+                                                exclude_drug_classes or [])
 
     if alternatives:
         logger.info(f"Found {len(alternatives)} alternatives: {alternatives}")
@@ -246,3 +299,32 @@ def get_alternatives(
     return {
         "error": f"No alternatives found with active ingredient: {active_ingredient}"
     }
+
+
+def _async_variant(tool):
+    """
+    Wrap a tool as a coroutine that is safe to await on the event loop:
+    it runs on the tool thread pool when the repository blocks on I/O
+    and directly otherwise.
+    """
+    @functools.wraps(tool)
+    async def variant(*args, **kwargs):
+        return await run_repository_io(tool, *args, **kwargs)
+
+    variant.__name__ = variant.__qualname__ = f"{tool.__name__}_async"
+    return variant
+
+
+get_patient_details_async = _async_variant(get_patient_details)
+get_medication_info_async = _async_variant(get_medication_info)
+check_user_status_async = _async_variant(check_user_status)
+check_user_status_batch_async = _async_variant(check_user_status_batch)
+get_alternatives_async = _async_variant(get_alternatives)
+
+ASYNC_TOOLS = {
+    "get_patient_details": get_patient_details_async,
+    "get_medication_info": get_medication_info_async,
+    "check_user_status": check_user_status_async,
+    "check_user_status_batch": check_user_status_batch_async,
+    "get_alternatives": get_alternatives_async,
+}
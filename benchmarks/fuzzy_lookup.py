@@ -0,0 +1,61 @@
+"""
+Benchmark for fuzzy medication name suggestions.
+
+Builds a FuzzyNameIndex over a synthetic catalog of pronounceable names,
+misspells a sample of them with one substitution and reports latency per
+suggestion and how often the intended name is in the top suggestions.
+
+Usage: python -m benchmarks.fuzzy_lookup [catalog size]
+"""
+
+import random
+import string
+import sys
+import time
+
+from app.fuzzy import FuzzyNameIndex
+
+CONSONANTS = "bcdfghjklmnpqrstvwxz"
+VOWELS = "aeiouy"
+QUERIES = 2000
+
+
+def synthetic_names(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        syllables = rng.randint(2, 4)
+        name = "".join(rng.choice(CONSONANTS) + rng.choice(VOWELS)
+                       + (rng.choice(CONSONANTS) if rng.random() < 0.4 else "")
+                       for _ in range(syllables))
+        names.add(name.capitalize())
+    return sorted(names)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    names = synthetic_names(size)
+
+    start = time.perf_counter()
+    index = FuzzyNameIndex((name, name) for name in names)
+    print(f"Indexed {len(index)} names in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(2)
+    queries = []
+    for name in rng.sample(names, QUERIES):
+        chars = list(name.lower())
+        chars[rng.randrange(len(chars))] = rng.choice(string.ascii_lowercase)
+        queries.append(("".join(chars), name))
+
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in queries:
+        hits += expected in index.suggest(query)
+    elapsed = time.perf_counter() - start
+
+    print(f"{elapsed / QUERIES * 1000:.3f} ms per suggestion, "
+          f"intended name in top suggestions for {hits / QUERIES:.1%} of queries")
+
+
+if __name__ == "__main__":
+    main()
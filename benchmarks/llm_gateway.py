@@ -0,0 +1,72 @@
+"""
+Load test for the LLM gateway against the local mock server.
+
+Starts benchmarks.mock_llm in-process (with injected 429/503 failures),
+then opens many concurrent streamed completions through LLMGateway and
+reports outcomes, latency, retries and the peak number of concurrent
+upstream requests (which must not exceed the gateway limit).
+
+Usage: python -m benchmarks.llm_gateway [requests] [fail rate]
+"""
+
+import asyncio
+import logging
+import statistics
+import sys
+import time
+
+from app.llm_gateway import GatewayConfig, GatewayError, LLMGateway, create_client
+from benchmarks.mock_llm import MockLLM, serve
+
+PORT = 8011
+CONCURRENCY_LIMIT = 8
+
+
+async def one_request(gateway: LLMGateway):
+    began = time.perf_counter()
+    try:
+        async with gateway.stream(model="gpt-5-mini", messages=[{"role": "user", "content": "hi"}]) as response:
+            async for _ in response:
+                pass
+        return "ok", time.perf_counter() - began
+    except GatewayError as e:
+        return type(e).__name__, time.perf_counter() - began
+
+
+async def run(requests: int, fail_rate: float) -> None:
+    mock = MockLLM(latency=0.05, fail_rate=fail_rate)
+    server = await serve(mock, port=PORT)
+    config = GatewayConfig(max_concurrency=CONCURRENCY_LIMIT, max_queue=requests, queue_timeout=30.0,
+                           backoff_base=0.05, breaker_threshold=50, base_url=f"http://127.0.0.1:{PORT}/v1")
+    gateway = LLMGateway(create_client("mock-key", config), config)
+
+    began = time.perf_counter()
+    results = await asyncio.gather(*(one_request(gateway) for _ in range(requests)))
+    elapsed = time.perf_counter() - began
+
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    latencies = sorted(latency for outcome, latency in results if outcome == "ok")
+    print(f"{requests} requests in {elapsed:.2f}s, fail rate {fail_rate:.0%}: {outcomes}")
+    if latencies:
+        print(f"  latency p50 {statistics.median(latencies) * 1000:.0f}ms "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f}ms")
+    print(f"  upstream requests {mock.requests} (injected failures {mock.failures}), "
+          f"peak concurrent {mock.peak_active} (limit {CONCURRENCY_LIMIT})")
+    print(f"  gateway: {gateway.stats()}")
+
+    await gateway.close()
+    server.close()
+    await server.wait_closed()
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    fail_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    asyncio.run(run(requests, fail_rate))
+
+
+if __name__ == "__main__":
+    main()
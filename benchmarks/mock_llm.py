@@ -0,0 +1,122 @@
+"""
+Mock OpenAI-compatible chat completions server for testing the LLM gateway.
+
+Streams a fixed reply as chat.completion.chunk SSE events after a
+configurable delay, over keep-alive HTTP/1.1. A fraction of requests can
+fail with 429 (with Retry-After) or 503 to exercise retries and the
+circuit breaker.
+
+Usage: python -m benchmarks.mock_llm [--port 8001] [--latency 0.2] [--fail-rate 0.1]
+Then run the backend with OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+REPLY = "This is a mock reply from the local test server."
+
+
+class MockLLM:
+    """Serves /v1/chat/completions with injected latency and failures."""
+
+    def __init__(self, latency: float = 0.2, fail_rate: float = 0.0, chunk_delay: float = 0.01):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self.failures = 0
+        self.active = 0
+        self.peak_active = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                await self.respond(request_line.decode("latin-1").split(" ")[1], body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        self.requests += 1
+        if not path.endswith("/chat/completions"):
+            self._send(writer, 404, b'{"error": {"message": "not found"}}')
+            return
+        if random.random() < self.fail_rate:
+            self.failures += 1
+            status = random.choice((429, 503))
+            extra = {"retry-after": "0.1"} if status == 429 else {}
+            self._send(writer, status, b'{"error": {"message": "injected failure"}}', extra)
+            await writer.drain()
+            return
+
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            model = json.loads(body or b"{}").get("model", "mock")
+            await asyncio.sleep(self.latency)
+            writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+                         b"transfer-encoding: chunked\r\n\r\n")
+            created = int(time.time())
+            for word in REPLY.split(" "):
+                await self._chunk(writer, model, created, {"content": word + " "}, None)
+                await asyncio.sleep(self.chunk_delay)
+            await self._chunk(writer, model, created, {}, "stop")
+            self._write_chunk(writer, b"data: [DONE]\n\n")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            self.active -= 1
+
+    async def _chunk(self, writer, model, created, delta, finish_reason) -> None:
+        event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        self._write_chunk(writer, f"data: {json.dumps(event)}\n\n".encode())
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    @staticmethod
+    def _send(writer, status: int, body: bytes, headers=None) -> None:
+        lines = [f"HTTP/1.1 {status} Error", "content-type: application/json", f"content-length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+
+
+async def serve(mock: MockLLM, host: str = "127.0.0.1", port: int = 8001) -> asyncio.AbstractServer:
+    return await asyncio.start_server(mock.handle, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first chunk")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered 429/503")
+    args = parser.parse_args()
+
+    async def run():
+        server = await serve(MockLLM(args.latency, args.fail_rate), port=args.port)
+        print(f"Mock LLM listening on http://127.0.0.1:{args.port}/v1")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for the SQLite session store shared across worker processes.
+
+Each worker process simulates chat turns on its own sessions: load the
+history, then append a user message, a tool call, its result and the
+assistant reply, as /chat does. Reports turns/sec for 1, 2 and 4 workers
+sharing one database file.
+
+Usage: python -m benchmarks.session_store [turns per worker]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from app.sessions import SqliteSessionStore
+
+SESSIONS_PER_WORKER = 50
+
+
+def turn_messages(turn: int):
+    return [
+        {"role": "user", "content": f"Is Ibuprofen in stock? ({turn})"},
+        {"role": "assistant", "content": "", "tool_calls": [{
+            "id": f"call_{turn}", "type": "function",
+            "function": {"name": "get_medication_info", "arguments": '{"name": "Ibuprofen"}'}}]},
+        {"role": "tool", "tool_call_id": f"call_{turn}",
+         "content": '{"name": "Ibuprofen", "stock_level": 150, "requires_rx": false}'},
+        {"role": "assistant", "content": "Yes, Ibuprofen is in stock."},
+    ]
+
+
+def worker(path: str, worker_id: int, turns: int, start, results) -> None:
+    store = SqliteSessionStore(path, max_sessions=100_000, max_bytes=1 << 40)
+    sessions = [f"w{worker_id}-s{i}" for i in range(SESSIONS_PER_WORKER)]
+    for session_id in sessions:
+        store.create(session_id, [{"role": "system", "content": "You are a pharmacy assistant."}])
+    start.wait()
+    began = time.perf_counter()
+    for turn in range(turns):
+        session_id = sessions[turn % len(sessions)]
+        messages = store.get(session_id)
+        new = turn_messages(turn)
+        messages.extend(new)
+        store.append(session_id, new)
+    results.put(time.perf_counter() - began)
+    store.close()
+
+
+def run(workers: int, turns: int) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        SqliteSessionStore(path).close()
+        start = multiprocessing.Barrier(workers)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, i, turns, start, results))
+                     for i in range(workers)]
+        for process in processes:
+            process.start()
+        elapsed = max(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+    return workers * turns / elapsed
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    baseline = None
+    for workers in (1, 2, 4):
+        rate = run(workers, turns)
+        baseline = baseline or rate
+        print(f"{workers} worker(s): {rate:,.0f} turns/sec ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark for SSE frame coalescing.
+
+Replays a long Hebrew answer as small deltas arriving every few
+milliseconds (on a simulated clock) three ways: the previous per-delta
+json.dumps, SSEWriter in per-token mode, and SSEWriter with coalescing.
+Reports frames and bytes per response, writer CPU per response and
+frames/sec, plus the client-side cost of parsing every frame and
+re-rendering the whole answer on each one, as ui.py does.
+
+Usage: python -m benchmarks.sse_writer [deltas per response]
+"""
+
+import json
+import sys
+import time
+
+from app.sse import SSEWriter
+
+RESPONSES = 20
+DELTA_INTERVAL = 0.004  # seconds between model deltas (~250 tokens/sec)
+WORDS = "התרופה זמינה במלאי ואינה דורשת מרשם. יש ליטול לפי ההוראות שעל גבי האריזה".split(" ")
+
+
+def deltas(count: int):
+    return [WORDS[i % len(WORDS)] + " " for i in range(count)]
+
+
+def write_legacy(parts):
+    # Previous behavior: one json.dumps of a dict per delta, non-ASCII escaped
+    frames = [f"data: {json.dumps({'content': part})}\n\n" for part in parts]
+    frames.append(f"data: {json.dumps({'stats': {'rounds': 1}})}\n\n")
+    return frames
+
+
+def write_response(parts, flush_interval: float):
+    now = [0.0]
+    writer = SSEWriter(flush_interval=flush_interval, clock=lambda: now[0])
+    frames = []
+    for part in parts:
+        now[0] += DELTA_INTERVAL
+        frame = writer.content(part)
+        if frame:
+            frames.append(frame)
+    frames.append(writer.event({"stats": {"rounds": 1}}))
+    return frames
+
+
+def render_client(frames) -> str:
+    # ui.py: parse each data line, append the content, re-render the whole answer
+    full_response = ""
+    rendered = ""
+    for frame in frames:
+        for line in frame.split("\n"):
+            if line.startswith("data: "):
+                data = json.loads(line[6:])
+                if "content" in data:
+                    full_response += data["content"]
+                    rendered = f'<div style="direction: rtl; text-align: right;">{full_response}</div>'
+    return rendered
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    parts = deltas(count)
+    for name, interval in (("previous", None), ("per-token", 0.0), ("coalesced 30ms/256B", 0.03)):
+        began = time.process_time()
+        for _ in range(RESPONSES):
+            frames = write_legacy(parts) if interval is None else write_response(parts, interval)
+        writer_cpu = (time.process_time() - began) / RESPONSES
+
+        began = time.process_time()
+        for _ in range(RESPONSES):
+            render_client(frames)
+        client_cpu = (time.process_time() - began) / RESPONSES
+
+        size = sum(len(frame.encode("utf-8")) for frame in frames)
+        print(f"{name:>20}: {len(frames):5d} frames/response, {size / 1024:6.1f} KiB, "
+              f"writer {writer_cpu * 1000:6.2f}ms CPU ({len(frames) / writer_cpu:,.0f} frames/sec), "
+              f"client parse+render {client_cpu * 1000:7.2f}ms CPU")
+
+
+if __name__ == "__main__":
+    main()
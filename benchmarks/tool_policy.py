@@ -0,0 +1,80 @@
+"""
+Benchmark for tool execution policies.
+
+Runs check_user_status on the memory and SQLite backends under each
+policy, plus asyncio.to_thread (the previous behavior) for comparison.
+Reports mean/p50/p99 latency per call when calls are made one at a
+time, and calls/sec when batches of concurrent calls are gathered.
+
+Usage: python -m benchmarks.tool_policy [calls per policy]
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from app.repository import create_repository, set_repository
+from app.tool_exec import POLICIES, ToolRunner, shutdown_pool
+from app.tools import ASYNC_TOOLS, check_user_status
+
+CONCURRENCY = 32
+ARGS = {"user_id": "312456789", "med_name": "Lisinopril"}
+
+
+async def run_sequential(call, calls: int):
+    latencies = []
+    for _ in range(calls):
+        began = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - began)
+    return latencies
+
+
+async def run_concurrent(call, calls: int) -> float:
+    began = time.perf_counter()
+    for _ in range(calls // CONCURRENCY):
+        await asyncio.gather(*(call() for _ in range(CONCURRENCY)))
+    return (calls // CONCURRENCY) * CONCURRENCY / (time.perf_counter() - began)
+
+
+def callers():
+    tools = {"check_user_status": check_user_status}
+    for policy in POLICIES:
+        runner = ToolRunner(tools, ASYNC_TOOLS, {"check_user_status": policy})
+        yield policy, lambda runner=runner: runner.run("check_user_status", ARGS)
+    yield "to_thread", lambda: asyncio.to_thread(check_user_status, **ARGS)
+
+
+async def bench(backend: str, calls: int) -> None:
+    print(f"{backend} backend:")
+    for name, call in callers():
+        await run_sequential(call, min(calls, 200))  # warm up connections and caches
+        latencies = sorted(await run_sequential(call, calls))
+        rate = await run_concurrent(call, calls)
+        print(f"  {name:>9}: mean {statistics.fmean(latencies) * 1e6:7.1f}us  "
+              f"p50 {latencies[len(latencies) // 2] * 1e6:7.1f}us  "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:7.1f}us  "
+              f"{rate:10,.0f} calls/sec x{CONCURRENCY}")
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    set_repository(create_repository("memory"))
+    asyncio.run(bench("memory", calls))
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = create_repository("sqlite", os.path.join(directory, "pharmacy.db"))
+        set_repository(repository)
+        asyncio.run(bench("sqlite", calls))
+        shutdown_pool()
+        repository.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import unittest
+from unittest import mock
+
+from app.repository import InMemoryRepository, create_repository, get_repository, set_repository
+from app.snapshots import reload_snapshot
+
+
+class ReloadKeepsStockTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"PHARMACY_DB_BACKEND": "memory"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("PHARMACY_CATALOG_PATH", None)
+        set_repository(create_repository())
+
+    def test_decrement_survives_reload(self):
+        repository = get_repository()
+        self.assertIsInstance(repository, InMemoryRepository)
+        med_key, med = repository.find_medication("Ibuprofen")
+        level = repository.inventory.decrement(med_key, 3, med.stock_level)
+
+        report = reload_snapshot()
+
+        reloaded = get_repository()
+        self.assertIsNot(reloaded, repository)
+        self.assertEqual(report["stock_levels_kept"], 1)
+        self.assertEqual(reloaded.inventory.level(med_key, med.stock_level), level)
+
+        # A call still holding the old snapshot writes to the same store
+        repository.inventory.restock(med_key, 1, med.stock_level)
+        self.assertEqual(reloaded.inventory.level(med_key, med.stock_level), level + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
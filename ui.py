@@ -72,6 +72,8 @@ if prompt := st.chat_input("How can I help you with your medication?"):
     with st.chat_message("assistant"):
         response_placeholder = st.empty()
         full_response = ""
+        stream_error = None
+        session_busy = False
         tool_calls_for_message = []  # Track tool calls for this message
 
         # Status box (created once)
@@ -107,14 +109,28 @@ if prompt := st.chat_input("How can I help you with your medication?"):
                                     unsafe_allow_html=True
                                 )
 
+                            # Backend errors (LLM unavailable or busy) arrive as events, not HTTP errors
+                            if "error" in data:
+                                stream_error = data["error"]
+                                session_busy = data.get("busy", False)
+
             # Final render
             final_dir = get_direction(full_response)
             response_placeholder.markdown(
                 f'<div style="direction: {final_dir}; text-align: {get_alignment(final_dir)};">{full_response}</div>',
                 unsafe_allow_html=True
             )
-            st.session_state.messages.append(
-                {"role": "assistant", "content": full_response, "tools": tool_calls_for_message})
+            if session_busy:
+                # The backend did not keep this message, so drop it here too
+                status_container.update(label="Previous message still in progress", state="error")
+                st.warning(f"⏳ {stream_error}")
+                st.session_state.messages.pop()
+            elif stream_error:
+                status_container.update(label="Request Error", state="error")
+                st.error(f"❌ {stream_error}")
+            if full_response:
+                st.session_state.messages.append(
+                    {"role": "assistant", "content": full_response, "tools": tool_calls_for_message})
 
         except requests.exceptions.HTTPError as e:
             status_container.update(label="Request Error", state="error")